@@ -0,0 +1,14 @@
+from rest_framework.pagination import CursorPagination
+
+class ApiCursorPagination(CursorPagination):
+    """Opaque cursor pages, constant cost at any depth (no OFFSET, no COUNT)"""
+    page_size = 100
+    page_size_query_param = 'page_size'
+    max_page_size = 1000
+    ordering = '-created_at'
+
+class AppointmentCursorPagination(ApiCursorPagination):
+    ordering = 'start_datetime'
+
+class PurchaseCursorPagination(ApiCursorPagination):
+    ordering = '-purchase_date'
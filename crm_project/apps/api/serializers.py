@@ -0,0 +1,117 @@
+from rest_framework import serializers
+
+from apps.appointments.models import Appointment
+from apps.customers.models import Customer, CustomerInteraction, Purchase
+
+class SparseFieldsMixin:
+    """Serializer limited to the fields listed in context['fields'] (all when absent)"""
+    
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        requested = self.context.get('fields')
+        if requested:
+            for name in set(self.fields) - set(requested):
+                self.fields.pop(name)
+
+class CustomerSerializer(SparseFieldsMixin, serializers.ModelSerializer):
+    segment_name = serializers.CharField(source='segment.name', read_only=True, default=None)
+    
+    class Meta:
+        model = Customer
+        fields = [
+            'id', 'first_name', 'last_name', 'email', 'phone',
+            'address', 'city', 'state', 'postal_code', 'country',
+            'company', 'position', 'segment', 'segment_name', 'status', 'notes',
+            'total_revenue', 'purchase_count', 'last_interaction_at', 'next_appointment_at',
+            'created_at', 'updated_at',
+        ]
+        read_only_fields = ['total_revenue']
+
+class CustomerUpsertSerializer(serializers.ModelSerializer):
+    """One record of a bulk upsert, validated without touching the database.
+    
+    Email uniqueness is what the upsert resolves and segments are checked for
+    the whole request at once, so neither runs a query per record.
+    """
+    segment = serializers.IntegerField(source='segment_id', required=False, allow_null=True)
+    
+    class Meta:
+        model = Customer
+        fields = [
+            'first_name', 'last_name', 'email', 'phone',
+            'address', 'city', 'state', 'postal_code', 'country',
+            'company', 'position', 'segment', 'status', 'notes'
+        ]
+        extra_kwargs = {'email': {'validators': []}}
+
+class AppointmentSerializer(SparseFieldsMixin, serializers.ModelSerializer):
+    customer_email = serializers.CharField(source='customer.email', read_only=True)
+    appointment_type_name = serializers.CharField(source='appointment_type.name', read_only=True)
+    
+    class Meta:
+        model = Appointment
+        fields = [
+            'id', 'customer', 'customer_email', 'appointment_type', 'appointment_type_name',
+            'assigned_to', 'start_datetime', 'end_datetime', 'status',
+            'title', 'description', 'location', 'meeting_url',
+            'created_at', 'updated_at',
+        ]
+
+class PurchaseSerializer(SparseFieldsMixin, serializers.ModelSerializer):
+    class Meta:
+        model = Purchase
+        fields = ['id', 'customer', 'product_service', 'amount', 'purchase_date', 'description']
+
+class CustomerInteractionSerializer(SparseFieldsMixin, serializers.ModelSerializer):
+    class Meta:
+        model = CustomerInteraction
+        fields = ['id', 'customer', 'interaction_type', 'subject', 'description', 'created_at', 'created_by']
+        read_only_fields = ['created_by']
+
+# Field types whose database value differs from the JSON representation
+CONVERTED_FIELDS = (serializers.DateTimeField, serializers.DateField, serializers.DecimalField)
+
+class ValuesSerializer:
+    """Read-only fast path for list endpoints.
+    
+    Rows come from queryset.values() over the selected fields' sources, so
+    no model instances are built and DRF fields only run for the few types
+    (dates, decimals) whose representation differs from the raw value. The
+    output matches the wrapped ModelSerializer.
+    """
+    
+    def __init__(self, serializer):
+        fields = serializer.fields
+        self.columns = [(name, value_path(field)) for name, field in fields.items()]
+        self.converters = [
+            (name, field.to_representation)
+            for name, field in fields.items()
+            if isinstance(field, CONVERTED_FIELDS)
+        ]
+    
+    @property
+    def paths(self):
+        return [path for _, path in self.columns]
+    
+    def to_representation(self, row):
+        data = {name: row[path] for name, path in self.columns}
+        for name, convert in self.converters:
+            if data[name] is not None:
+                data[name] = convert(data[name])
+        return data
+
+def value_path(field):
+    """ORM lookup for a serializer field ('segment.name' -> 'segment__name')"""
+    return field.source.replace('.', '__')
+
+def only_paths(serializer):
+    """(only, select_related) lookups that load exactly the serializer's fields"""
+    only = {serializer.Meta.model._meta.pk.name}
+    related = set()
+    for field in serializer.fields.values():
+        path = value_path(field)
+        only.add(path)
+        if '__' in path:
+            related.add(path.rsplit('__', 1)[0])
+    # A relation followed by select_related cannot itself be deferred
+    return sorted(only | related), sorted(related)
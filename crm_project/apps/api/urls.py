@@ -0,0 +1,16 @@
+from django.urls import include, path
+from rest_framework.routers import DefaultRouter
+
+from . import views
+
+app_name = 'api'
+
+router = DefaultRouter()
+router.register('customers', views.CustomerViewSet, basename='customer')
+router.register('appointments', views.AppointmentViewSet, basename='appointment')
+router.register('purchases', views.PurchaseViewSet, basename='purchase')
+router.register('interactions', views.CustomerInteractionViewSet, basename='interaction')
+
+urlpatterns = [
+    path('', include(router.urls)),
+]
@@ -0,0 +1,194 @@
+from collections import Counter
+
+from rest_framework import viewsets
+from rest_framework.decorators import action
+from rest_framework.exceptions import ValidationError
+from rest_framework.response import Response
+
+from apps.appointments.calendar_sync import enqueue_calendar_sync
+from apps.appointments.dates import filter_day_range
+from apps.appointments.email_outbox import enqueue_appointment_email
+from apps.appointments.models import Appointment
+from apps.customers.ingestion import existing_customer_emails, upsert_customers
+from apps.customers.models import Customer, CustomerInteraction, CustomerSegment, Purchase
+from apps.customers.search import filter_customers
+
+from .pagination import ApiCursorPagination, AppointmentCursorPagination, PurchaseCursorPagination
+from .serializers import (
+    AppointmentSerializer, CustomerInteractionSerializer, CustomerSerializer, CustomerUpsertSerializer,
+    PurchaseSerializer, ValuesSerializer, only_paths
+)
+
+# Records accepted by one bulk upsert request
+MAX_UPSERT_RECORDS = 10000
+
+def upsert_error(index, email, errors):
+    return {'index': index, 'email': email, 'status': 'error', 'errors': errors}
+
+class ApiViewSet(viewsets.ModelViewSet):
+    """Model endpoints with ?fields= sparse fieldsets and a values() fast path for lists.
+    
+    Lists select only the requested columns through queryset.values(). Reads
+    of single objects load them with .only() plus select_related for the
+    related fields shown. Writes always go through the full serializer and
+    model save().
+    """
+    pagination_class = ApiCursorPagination
+    
+    # Query params mapped to plain equality filters
+    filter_params = ()
+    
+    def requested_fields(self):
+        """Field names from ?fields= (None means all), only honoured on reads"""
+        if self.request.method != 'GET':
+            return None
+        raw = self.request.query_params.get('fields')
+        if not raw:
+            return None
+        known = set(self.get_serializer_class().Meta.fields) | set(self.get_serializer_class()._declared_fields)
+        fields = [name for name in (part.strip() for part in raw.split(',')) if name in known]
+        return fields or None
+    
+    def get_serializer_context(self):
+        context = super().get_serializer_context()
+        context['fields'] = self.requested_fields()
+        return context
+    
+    def filter_queryset(self, queryset):
+        for param in self.filter_params:
+            value = self.request.query_params.get(param)
+            if value:
+                queryset = queryset.filter(**{param: value})
+        return queryset
+    
+    def get_queryset(self):
+        queryset = super().get_queryset()
+        if self.request.method == 'GET' and self.action != 'list':
+            only, related = only_paths(self.get_serializer())
+            queryset = queryset.select_related(*related).only(*only)
+        return queryset
+    
+    def list(self, request, *args, **kwargs):
+        fast = ValuesSerializer(self.get_serializer())
+        paths = fast.paths
+        
+        # The cursor is built from the ordering column, so it is always selected
+        ordering = self.paginator.ordering.lstrip('-')
+        if ordering not in paths:
+            paths = paths + [ordering]
+        
+        rows = self.filter_queryset(self.get_queryset()).values(*paths)
+        page = self.paginate_queryset(rows)
+        return self.get_paginated_response([fast.to_representation(row) for row in page])
+
+class CustomerViewSet(ApiViewSet):
+    queryset = Customer.objects.all()
+    serializer_class = CustomerSerializer
+    
+    def filter_queryset(self, queryset):
+        # Segment, status, activity and search filters shared with the customer list
+        return filter_customers(queryset, self.request.query_params)
+    
+    def perform_create(self, serializer):
+        serializer.save(created_by=self.request.user)
+    
+    @action(detail=False, methods=['post'], url_path='bulk-upsert')
+    def bulk_upsert(self, request):
+        """Create or update up to MAX_UPSERT_RECORDS customers keyed on email.
+        
+        Takes a list of records (or {"records": [...]}). Existing customers
+        are found with one query and may be sent partially; invalid records
+        are reported per row and the valid ones are still written.
+        """
+        records = request.data.get('records') if isinstance(request.data, dict) else request.data
+        if not isinstance(records, list) or not records:
+            raise ValidationError({'records': 'Expected a non-empty list of customers'})
+        if len(records) > MAX_UPSERT_RECORDS:
+            raise ValidationError({'records': f'At most {MAX_UPSERT_RECORDS} customers per request'})
+        
+        emails = [
+            str(record.get('email') or '').strip() if isinstance(record, dict) else ''
+            for record in records
+        ]
+        existing = existing_customer_emails(email for email in emails if email)
+        
+        # One serializer of each kind validates every record (no per-record field setup)
+        new_record = CustomerUpsertSerializer()
+        update_record = CustomerUpsertSerializer(partial=True)
+        
+        results = [None] * len(records)
+        valid = {}
+        for index, (record, email) in enumerate(zip(records, emails)):
+            serializer = update_record if email in existing else new_record
+            try:
+                data = serializer.run_validation(record)
+            except ValidationError as e:
+                results[index] = upsert_error(index, email, e.detail)
+                continue
+            if data['email'] in valid:
+                results[index] = upsert_error(index, email, {'email': ['Duplicated in this request']})
+                continue
+            valid[data['email']] = (index, data)
+        
+        segment_ids = {data['segment_id'] for _, data in valid.values() if data.get('segment_id')}
+        known_segments = set(CustomerSegment.objects.filter(pk__in=segment_ids).values_list('pk', flat=True))
+        for email, (index, data) in list(valid.items()):
+            if data.get('segment_id') and data['segment_id'] not in known_segments:
+                results[index] = upsert_error(index, email, {'segment': ['Invalid segment']})
+                del valid[email]
+        
+        written = upsert_customers([data for _, data in valid.values()], existing, created_by=request.user)
+        for email, (index, _) in valid.items():
+            pk, created = written[email]
+            results[index] = {
+                'index': index, 'email': email, 'status': 'created' if created else 'updated', 'id': pk,
+            }
+        
+        counts = Counter(result['status'] for result in results)
+        return Response({
+            'created': counts['created'],
+            'updated': counts['updated'],
+            'failed': counts['error'],
+            'results': results,
+        })
+
+class AppointmentViewSet(ApiViewSet):
+    queryset = Appointment.objects.all()
+    serializer_class = AppointmentSerializer
+    pagination_class = AppointmentCursorPagination
+    filter_params = ('customer', 'assigned_to', 'status')
+    
+    # Appointments are cancelled, not deleted, so calendars and customers get notified
+    http_method_names = ['get', 'post', 'put', 'patch', 'head', 'options']
+    
+    def filter_queryset(self, queryset):
+        queryset = super().filter_queryset(queryset)
+        try:
+            return filter_day_range(
+                queryset, self.request.query_params.get('date_from'), self.request.query_params.get('date_to')
+            )
+        except ValueError:
+            raise ValidationError({'date_from': 'Invalid date format'})
+    
+    def perform_create(self, serializer):
+        appointment = serializer.save(created_by=self.request.user)
+        enqueue_calendar_sync(appointment, 'create')
+        enqueue_appointment_email(appointment, 'confirmation')
+    
+    def perform_update(self, serializer):
+        appointment = serializer.save()
+        enqueue_calendar_sync(appointment, 'update')
+
+class PurchaseViewSet(ApiViewSet):
+    queryset = Purchase.objects.all()
+    serializer_class = PurchaseSerializer
+    pagination_class = PurchaseCursorPagination
+    filter_params = ('customer',)
+
+class CustomerInteractionViewSet(ApiViewSet):
+    queryset = CustomerInteraction.objects.all()
+    serializer_class = CustomerInteractionSerializer
+    filter_params = ('customer', 'interaction_type')
+    
+    def perform_create(self, serializer):
+        serializer.save(created_by=self.request.user)
@@ -0,0 +1,114 @@
+import heapq
+from bisect import bisect_right
+from datetime import datetime, timedelta
+
+from django.utils import timezone
+
+from .dates import day_range
+from .models import Appointment, AvailabilitySlot
+
+# Limits that keep search_availability's response time bounded
+MAX_SEARCH_DAYS = 31
+MAX_SEARCH_USERS = 50
+
+# Appointments in these statuses block the time slot
+BLOCKING_STATUSES = ['scheduled', 'confirmed']
+
+DEFAULT_SLOT_LENGTH = timedelta(hours=1)
+
+def merge_intervals(intervals):
+    """Merge overlapping (start, end) intervals into a sorted, disjoint list"""
+    merged = []
+    for start, end in sorted(intervals):
+        if merged and start <= merged[-1][1]:
+            if end > merged[-1][1]:
+                merged[-1][1] = end
+        else:
+            merged.append([start, end])
+    return merged
+
+def free_slots(windows, busy, slot_length):
+    """Split availability windows into slot_length slots that do not overlap busy intervals.
+    
+    Busy intervals are merged once and each window is swept left to right, so
+    the cost is O((slots + busy) log busy) with no per-slot queries.
+    Raises ValueError for a zero or negative slot_length, which would never end.
+    """
+    if slot_length <= timedelta(0):
+        raise ValueError('slot_length must be positive')
+    
+    busy = merge_intervals(busy)
+    busy_ends = [end for _, end in busy]
+    
+    slots = []
+    for window_start, window_end in sorted(windows):
+        i = bisect_right(busy_ends, window_start)
+        current = window_start
+        while current + slot_length <= window_end:
+            slot_end = current + slot_length
+            while i < len(busy) and busy[i][1] <= current:
+                i += 1
+            if i >= len(busy) or busy[i][0] >= slot_end:
+                slots.append((current, slot_end))
+            current = slot_end
+    return slots
+
+def availability_windows(slots, day):
+    """Aware (start, end) windows for the AvailabilitySlot rows that apply to day"""
+    return [
+        (
+            timezone.make_aware(datetime.combine(day, slot.start_time)),
+            timezone.make_aware(datetime.combine(day, slot.end_time)),
+        )
+        for slot in slots if slot.weekday == day.weekday()
+    ]
+
+def busy_intervals(user_ids, start, end):
+    """Blocking appointments overlapping [start, end), grouped by assigned user, in one query"""
+    appointments = Appointment.objects.filter(
+        assigned_to_id__in=user_ids,
+        status__in=BLOCKING_STATUSES,
+        start_datetime__lt=end,
+        end_datetime__gt=start,
+    ).values_list('assigned_to_id', 'start_datetime', 'end_datetime')
+    
+    busy = {user_id: [] for user_id in user_ids}
+    for user_id, appointment_start, appointment_end in appointments:
+        busy[user_id].append((appointment_start, appointment_end))
+    return busy
+
+def search_availability(user_ids, date_from, date_to, slot_length, limit=20):
+    """Earliest free slots for any of the users between two dates (inclusive).
+    
+    Availability rules and appointments for every user are loaded in two
+    queries, free slots are computed per user and day in memory, and the
+    earliest `limit` candidates are returned as (start, end, user) tuples.
+    """
+    slots_by_user = {}
+    users = {}
+    for slot in AvailabilitySlot.objects.filter(
+        user_id__in=user_ids, is_active=True
+    ).select_related('user'):
+        slots_by_user.setdefault(slot.user_id, []).append(slot)
+        users[slot.user_id] = slot.user
+    
+    range_start, range_end = day_range(date_from, date_to)
+    busy = busy_intervals(list(slots_by_user), range_start, range_end)
+    now = timezone.now()
+    
+    candidates = []
+    for user_id, user_slots in slots_by_user.items():
+        windows = []
+        day = date_from
+        while day <= date_to:
+            windows.extend(availability_windows(user_slots, day))
+            day += timedelta(days=1)
+        
+        for start, end in free_slots(windows, busy[user_id], slot_length):
+            if start >= now:
+                candidates.append((start, end, user_id))
+    
+    return [
+        (start, end, users[user_id])
+        for start, end, user_id in heapq.nsmallest(limit, candidates)
+    ]
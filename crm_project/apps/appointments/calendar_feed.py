@@ -0,0 +1,85 @@
+import hashlib
+import time
+import uuid
+from datetime import datetime, timezone as dt_timezone
+
+from django.core.cache import cache
+from django.urls import reverse
+
+from .dates import filter_day_range
+from .models import Appointment
+
+FEED_VERSION_KEY = 'appointments:calendar:version'
+FEED_CACHE_TTL = 60 * 60
+
+STATUS_COLORS = {
+    'cancelled': '#dc3545',  # Red for cancelled
+    'completed': '#28a745',  # Green for completed
+}
+
+FEED_FIELDS = [
+    'id', 'title', 'description', 'status', 'start_datetime', 'end_datetime',
+    'appointment_type__color',
+    'customer__first_name', 'customer__last_name',
+    'assigned_to__first_name', 'assigned_to__last_name',
+]
+
+def feed_version():
+    """Timestamp of the last appointment change, shared by every process"""
+    version = cache.get(FEED_VERSION_KEY)
+    if version is None:
+        version = time.time()
+        if not cache.add(FEED_VERSION_KEY, version, timeout=None):
+            version = cache.get(FEED_VERSION_KEY, version)
+    return version
+
+def bump_feed_version():
+    """Invalidate every cached calendar feed"""
+    cache.set(FEED_VERSION_KEY, time.time(), timeout=None)
+
+def build_calendar_events(queryset):
+    """Calendar events from a values() projection (no model instances or per-row reverse)"""
+    placeholder = uuid.UUID(int=0)
+    url_template = reverse('appointments:detail', kwargs={'pk': placeholder}).replace(str(placeholder), '{}')
+    status_labels = dict(Appointment.STATUS_CHOICES)
+    
+    events = []
+    for row in queryset.values(*FEED_FIELDS):
+        color = STATUS_COLORS.get(row['status'], row['appointment_type__color'])
+        customer = f"{row['customer__first_name']} {row['customer__last_name']}"
+        events.append({
+            'id': str(row['id']),
+            'title': f"{row['title']} - {customer}",
+            'start': row['start_datetime'].isoformat(),
+            'end': row['end_datetime'].isoformat(),
+            'backgroundColor': color,
+            'borderColor': color,
+            'url': url_template.format(row['id']),
+            'extendedProps': {
+                'customer': customer,
+                'status': status_labels.get(row['status'], row['status']),
+                'assigned_to': f"{row['assigned_to__first_name']} {row['assigned_to__last_name']}".strip(),
+                'description': row['description'],
+            }
+        })
+    return events
+
+def feed_etag(user, start_date, end_date):
+    key = f'{feed_version()}:{user.pk}:{start_date}:{end_date}'
+    return hashlib.md5(key.encode()).hexdigest()
+
+def feed_last_modified():
+    return datetime.fromtimestamp(feed_version(), tz=dt_timezone.utc)
+
+def get_calendar_feed(user, start_date, end_date):
+    """Cached events for a user and date range, rebuilt after any appointment change.
+    
+    Raises ValueError for invalid dates.
+    """
+    cache_key = f'appointments:calendar:feed:{feed_etag(user, start_date, end_date)}'
+    events = cache.get(cache_key)
+    if events is None:
+        queryset = filter_day_range(Appointment.objects.all(), start_date, end_date)
+        events = build_calendar_events(queryset)
+        cache.set(cache_key, events, timeout=FEED_CACHE_TTL)
+    return events
@@ -0,0 +1,346 @@
+import time
+from datetime import timedelta, timezone as dt_timezone
+
+from django.conf import settings
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+from googleapiclient.errors import HttpError
+
+from .http import THROTTLED_STATUSES, retry_after, throttled_request
+from .models import Appointment, CalendarCredential
+from .services import CalendarClientCache, CalendarService, TOKEN_REFRESH_MARGIN
+
+# Window covered by the first (full) pull of a calendar
+INITIAL_SYNC_PAST = timedelta(days=30)
+INITIAL_SYNC_FUTURE = timedelta(days=365)
+
+def remote_change(event_id, cancelled=False, start=None, end=None, title=None):
+    """Provider-neutral description of one changed remote event"""
+    return {'event_id': event_id, 'cancelled': cancelled, 'start': start, 'end': end, 'title': title}
+
+class CalendarProvider:
+    """Interface for external calendar backends used by CalendarSyncEngine"""
+    name = None
+    
+    # Appointment field holding this provider's event id
+    event_id_field = None
+    
+    def is_configured(self):
+        raise NotImplementedError
+    
+    def sync_batch(self, operations):
+        """Apply (operation, appointment) pairs, returning None or an exception per item.
+        
+        Appointments whose user has not connected this provider are skipped
+        and reported as successful.
+        """
+        raise NotImplementedError
+    
+    def pull_changes(self, credential):
+        """Events changed since credential.sync_token, returns (changes, new_sync_token).
+        
+        Without a stored token a full pull of the initial window is done, which
+        yields the first token; later pulls only return what changed.
+        """
+        raise NotImplementedError
+
+class GoogleCalendarProvider(CalendarProvider):
+    name = 'google'
+    event_id_field = 'google_calendar_event_id'
+    
+    def is_configured(self):
+        return bool(settings.GOOGLE_CALENDAR_CLIENT_ID)
+    
+    def sync_batch(self, operations):
+        return CalendarService().sync_appointments_batch(operations)
+    
+    def parse_event(self, item):
+        if item.get('status') == 'cancelled':
+            return remote_change(item['id'], cancelled=True)
+        
+        start = parse_datetime(item.get('start', {}).get('dateTime') or '')
+        end = parse_datetime(item.get('end', {}).get('dateTime') or '')
+        if not start or not end:
+            # All-day events never come from appointments
+            return None
+        return remote_change(item['id'], start=start, end=end, title=item.get('summary', ''))
+    
+    def pull_changes(self, credential):
+        service = CalendarService().get_google_calendar_service(credential.user)
+        if not service:
+            return [], credential.sync_token
+        
+        params = {'calendarId': 'primary', 'showDeleted': True, 'singleEvents': True, 'maxResults': 250}
+        if credential.sync_token:
+            params['syncToken'] = credential.sync_token
+        else:
+            params['timeMin'] = (timezone.now() - INITIAL_SYNC_PAST).isoformat()
+        
+        changes = []
+        page_token = None
+        while True:
+            try:
+                response = service.events().list(pageToken=page_token, **params).execute()
+            except HttpError as e:
+                if e.resp.status == 410 and credential.sync_token:
+                    # Sync token expired: start over with a full pull
+                    credential.sync_token = ''
+                    return self.pull_changes(credential)
+                raise
+            
+            for item in response.get('items', []):
+                change = self.parse_event(item)
+                if change:
+                    changes.append(change)
+            
+            page_token = response.get('nextPageToken')
+            if not page_token:
+                return changes, response.get('nextSyncToken', '')
+
+class GraphCalendarProvider(CalendarProvider):
+    """Microsoft Graph (Outlook) calendars, written through the $batch endpoint"""
+    name = 'microsoft'
+    event_id_field = 'outlook_calendar_event_id'
+    
+    GRAPH_URL = 'https://graph.microsoft.com/v1.0'
+    TOKEN_URL = 'https://login.microsoftonline.com/common/oauth2/v2.0/token'
+    
+    # Graph accepts at most 20 requests per $batch call
+    BATCH_SIZE = 20
+    MAX_THROTTLE_ROUNDS = 3
+    
+    token_cache = CalendarClientCache()
+    
+    def is_configured(self):
+        return bool(settings.MICROSOFT_GRAPH_CLIENT_ID)
+    
+    def access_token(self, user_id):
+        """Cached access token for a user, refreshed shortly before it expires"""
+        cached = self.token_cache.get(user_id)
+        if cached and cached[1] - timezone.now() > TOKEN_REFRESH_MARGIN:
+            return cached[0]
+        
+        record = CalendarCredential.objects.filter(user_id=user_id, provider=self.name).first()
+        if record is None:
+            return None
+        
+        if not record.expiry or record.expiry - timezone.now() <= TOKEN_REFRESH_MARGIN:
+            if not record.refresh_token:
+                return None
+            self.refresh(record)
+        
+        self.token_cache.set(user_id, record.access_token, record.expiry)
+        return record.access_token
+    
+    def refresh(self, record):
+        response = throttled_request('POST', self.TOKEN_URL, data={
+            'client_id': settings.MICROSOFT_GRAPH_CLIENT_ID,
+            'client_secret': settings.MICROSOFT_GRAPH_CLIENT_SECRET,
+            'grant_type': 'refresh_token',
+            'refresh_token': record.refresh_token,
+            'scope': ' '.join(record.scopes or ['offline_access', 'Calendars.ReadWrite']),
+        })
+        response.raise_for_status()
+        data = response.json()
+        
+        record.access_token = data['access_token']
+        record.refresh_token = data.get('refresh_token', record.refresh_token)
+        record.expiry = timezone.now() + timedelta(seconds=int(data.get('expires_in', 3600)))
+        record.save(update_fields=['access_token', 'refresh_token', 'expiry', 'updated_at'])
+    
+    def event_body(self, appointment):
+        def graph_datetime(value):
+            return {
+                'dateTime': timezone.localtime(value).strftime('%Y-%m-%dT%H:%M:%S'),
+                'timeZone': settings.TIME_ZONE,
+            }
+        
+        event = {
+            'subject': appointment.title,
+            'body': {
+                'contentType': 'text',
+                'content': f"Cliente: {appointment.customer.full_name}\n{appointment.description}",
+            },
+            'start': graph_datetime(appointment.start_datetime),
+            'end': graph_datetime(appointment.end_datetime),
+            'attendees': [
+                {'emailAddress': {'address': appointment.customer.email}, 'type': 'required'},
+            ],
+        }
+        if appointment.location:
+            event['location'] = {'displayName': appointment.location}
+        return event
+    
+    def batch_request(self, request_id, operation, appointment):
+        """Sub-request of a $batch call (None if nothing to do)"""
+        event_id = appointment.outlook_calendar_event_id
+        if operation == 'cancel':
+            if not event_id:
+                return None
+            return {'id': request_id, 'method': 'DELETE', 'url': f'/me/events/{event_id}'}
+        
+        request = {
+            'id': request_id,
+            'body': self.event_body(appointment),
+            'headers': {'Content-Type': 'application/json'},
+        }
+        if event_id:
+            # A create retried after the event was already inserted becomes an update
+            request.update({'method': 'PATCH', 'url': f'/me/events/{event_id}'})
+        else:
+            request.update({'method': 'POST', 'url': '/me/events'})
+        return request
+    
+    def send_batch(self, token, requests_by_id, operations, results, created):
+        """Send one $batch call, retrying items Graph throttled individually"""
+        pending = dict(requests_by_id)
+        for attempt in range(self.MAX_THROTTLE_ROUNDS):
+            response = throttled_request(
+                'POST', f'{self.GRAPH_URL}/$batch',
+                json={'requests': list(pending.values())},
+                headers={'Authorization': f'Bearer {token}'},
+            )
+            response.raise_for_status()
+            
+            throttled = {}
+            wait = 0
+            for item in response.json().get('responses', []):
+                index = int(item['id'])
+                status = item.get('status', 500)
+                if status in THROTTLED_STATUSES:
+                    throttled[item['id']] = pending[item['id']]
+                    wait = max(wait, retry_after(item.get('headers') or {}, attempt))
+                elif status >= 400:
+                    results[index] = Exception(f"Graph {status}: {item.get('body')}")
+                else:
+                    results[index] = None
+                    appointment = operations[index][1]
+                    body = item.get('body') or {}
+                    if body.get('id') and not appointment.outlook_calendar_event_id:
+                        appointment.outlook_calendar_event_id = body['id']
+                        created.append(appointment)
+            
+            if not throttled:
+                return
+            pending = throttled
+            time.sleep(wait)
+        
+        for request_id in pending:
+            results[int(request_id)] = Exception('Graph throttled the request')
+    
+    def sync_batch(self, operations):
+        results = [None] * len(operations)
+        created = []
+        
+        by_user = {}
+        for index, (operation, appointment) in enumerate(operations):
+            by_user.setdefault(appointment.assigned_to_id, []).append(index)
+        
+        for user_id, indexes in by_user.items():
+            try:
+                token = self.access_token(user_id)
+            except Exception as e:
+                for index in indexes:
+                    results[index] = e
+                continue
+            if not token:
+                continue
+            
+            for start in range(0, len(indexes), self.BATCH_SIZE):
+                requests_by_id = {}
+                for index in indexes[start:start + self.BATCH_SIZE]:
+                    operation, appointment = operations[index]
+                    request = self.batch_request(str(index), operation, appointment)
+                    if request is not None:
+                        requests_by_id[str(index)] = request
+                
+                if not requests_by_id:
+                    continue
+                try:
+                    self.send_batch(token, requests_by_id, operations, results, created)
+                except Exception as e:
+                    for request_id in requests_by_id:
+                        if results[int(request_id)] is None:
+                            results[int(request_id)] = e
+        
+        if created:
+            Appointment.objects.bulk_update(created, ['outlook_calendar_event_id'])
+        return results
+    
+    def parse_event(self, item):
+        if '@removed' in item or item.get('isCancelled'):
+            return remote_change(item['id'], cancelled=True)
+        
+        # Times come back in UTC because of the outlook.timezone preference
+        start = parse_datetime(item.get('start', {}).get('dateTime') or '')
+        end = parse_datetime(item.get('end', {}).get('dateTime') or '')
+        if not start or not end:
+            return None
+        if timezone.is_naive(start):
+            start = timezone.make_aware(start, dt_timezone.utc)
+            end = timezone.make_aware(end, dt_timezone.utc)
+        return remote_change(item['id'], start=start, end=end, title=item.get('subject', ''))
+    
+    def pull_changes(self, credential):
+        token = self.access_token(credential.user_id)
+        if not token:
+            return [], credential.sync_token
+        
+        url = credential.sync_token
+        if not url:
+            now = timezone.now()
+            url = (
+                f'{self.GRAPH_URL}/me/calendarView/delta'
+                f'?startDateTime={(now - INITIAL_SYNC_PAST).strftime("%Y-%m-%dT%H:%M:%SZ")}'
+                f'&endDateTime={(now + INITIAL_SYNC_FUTURE).strftime("%Y-%m-%dT%H:%M:%SZ")}'
+            )
+        headers = {
+            'Authorization': f'Bearer {token}',
+            'Prefer': 'odata.maxpagesize=100, outlook.timezone="UTC"',
+        }
+        
+        changes = []
+        while True:
+            response = throttled_request('GET', url, headers=headers)
+            if response.status_code == 410 and credential.sync_token:
+                # Delta link expired: start over with a full pull
+                credential.sync_token = ''
+                return self.pull_changes(credential)
+            response.raise_for_status()
+            data = response.json()
+            
+            for item in data.get('value', []):
+                change = self.parse_event(item)
+                if change:
+                    changes.append(change)
+            
+            if data.get('@odata.nextLink'):
+                url = data['@odata.nextLink']
+            else:
+                return changes, data.get('@odata.deltaLink', '')
+
+PROVIDERS = [GoogleCalendarProvider, GraphCalendarProvider]
+
+def get_provider(name):
+    return next(provider() for provider in PROVIDERS if provider.name == name)
+
+class CalendarSyncEngine:
+    """Fans calendar operations out to every configured provider"""
+    
+    def __init__(self, providers=None):
+        if providers is None:
+            providers = [provider() for provider in PROVIDERS]
+        self.providers = [provider for provider in providers if provider.is_configured()]
+    
+    def sync(self, operations):
+        """Returns None or the first error per operation across all providers.
+        
+        Operations are idempotent per provider (creates become updates once an
+        event id is stored), so a failed item can be retried as a whole.
+        """
+        results = [None] * len(operations)
+        for provider in self.providers:
+            for index, error in enumerate(provider.sync_batch(operations)):
+                if error is not None and results[index] is None:
+                    results[index] = error
+        return results
@@ -0,0 +1,163 @@
+from collections import Counter
+from datetime import timedelta
+
+from django.db import transaction
+from django.utils import timezone
+
+from apps.customers.activity import refresh_customer_activity
+from .models import Appointment, AppointmentDailyStat, CalendarSyncOperation
+from .calendar_providers import CalendarSyncEngine, get_provider
+from .calendar_feed import bump_feed_version
+
+MAX_ATTEMPTS = 8
+
+# Operations claimed per worker pass (split into provider batches)
+BATCH_SIZE = 200
+
+# How long a claimed operation stays with its worker before it is due again
+CLAIM_LEASE = timedelta(minutes=15)
+
+def enqueue_calendar_sync(appointment, operation):
+    """Queue a calendar operation for an appointment and wake the worker after commit.
+    
+    Repeated updates are deduplicated: the worker sends the appointment state
+    it read when claiming, so one create or update that is still waiting is
+    enough. Rows a worker has claimed are 'processing' and not reused, since
+    they carry an older snapshot. A cancel supersedes any waiting create/update.
+    """
+    with transaction.atomic():
+        waiting = list(
+            CalendarSyncOperation.objects.select_for_update(skip_locked=True).filter(
+                appointment=appointment, status='pending', operation__in=['create', 'update']
+            ).values_list('pk', flat=True)
+        )
+        
+        if operation == 'cancel':
+            CalendarSyncOperation.objects.filter(pk__in=waiting).delete()
+        elif waiting:
+            return
+        
+        CalendarSyncOperation.objects.create(appointment=appointment, operation=operation)
+    
+    from .tasks import process_calendar_outbox
+    transaction.on_commit(lambda: process_calendar_outbox.delay())
+
+def retry_delay(attempts):
+    """Exponential backoff: 30s, 1min, 2min... capped at one hour"""
+    return timedelta(seconds=min(30 * 2 ** (attempts - 1), 3600))
+
+def claim_due_operations(batch_size=BATCH_SIZE):
+    """Mark a batch of due operations as processing, in a transaction that ends before any HTTP call.
+    
+    The claim is a lease: operations whose worker died are due again once
+    CLAIM_LEASE has passed.
+    """
+    now = timezone.now()
+    with transaction.atomic():
+        operations = list(
+            CalendarSyncOperation.objects.select_for_update(skip_locked=True, of=('self',)).filter(
+                status__in=['pending', 'processing'], next_attempt_at__lte=now
+            ).select_related('appointment', 'appointment__customer').order_by('created_at')[:batch_size]
+        )
+        CalendarSyncOperation.objects.filter(pk__in=[operation.pk for operation in operations]).update(
+            status='processing', next_attempt_at=now + CLAIM_LEASE
+        )
+    return operations
+
+def process_due_operations(batch_size=BATCH_SIZE):
+    """Process one batch of due operations, returns how many were handled"""
+    operations = claim_due_operations(batch_size)
+    if not operations:
+        return 0
+    
+    # Batched per provider and user (Google batch / Graph $batch), no row locks held meanwhile
+    results = CalendarSyncEngine().sync(
+        [(operation.operation, operation.appointment) for operation in operations]
+    )
+    
+    now = timezone.now()
+    for operation, error in zip(operations, results):
+        operation.attempts += 1
+        if error is not None:
+            operation.last_error = str(error)
+            if operation.attempts >= MAX_ATTEMPTS:
+                operation.status = 'failed'
+            else:
+                operation.status = 'pending'
+                operation.next_attempt_at = now + retry_delay(operation.attempts)
+        else:
+            operation.status = 'done'
+            operation.processed_at = now
+            operation.last_error = ''
+    
+    # One short UPDATE, rows of appointments deleted meanwhile are skipped
+    CalendarSyncOperation.objects.bulk_update(
+        operations, ['attempts', 'status', 'next_attempt_at', 'last_error', 'processed_at']
+    )
+    return len(operations)
+
+def apply_remote_changes(provider, changes):
+    """Write remote edits back to the matching appointments in bulk, returns rows changed.
+    
+    Local edits win: appointments with an outbound operation still pending or
+    processing are skipped, and that operation then overwrites the remote event.
+    """
+    by_event_id = {change['event_id']: change for change in changes}
+    if not by_event_id:
+        return 0
+    
+    field = provider.event_id_field
+    appointments = Appointment.objects.filter(**{f'{field}__in': list(by_event_id)}).exclude(
+        calendar_operations__status__in=['pending', 'processing']
+    )
+    
+    updated = []
+    stat_deltas = Counter()
+    for appointment in appointments:
+        change = by_event_id[getattr(appointment, field)]
+        before = (timezone.localdate(appointment.start_datetime), appointment.assigned_to_id, appointment.status)
+        
+        if change['cancelled']:
+            if appointment.status == 'cancelled':
+                continue
+            appointment.status = 'cancelled'
+        else:
+            remote = (change['start'], change['end'], change['title'] or appointment.title)
+            if remote == (appointment.start_datetime, appointment.end_datetime, appointment.title):
+                continue
+            appointment.start_datetime, appointment.end_datetime, appointment.title = remote
+        
+        after = (timezone.localdate(appointment.start_datetime), appointment.assigned_to_id, appointment.status)
+        if before != after:
+            stat_deltas[before] -= 1
+            stat_deltas[after] += 1
+        updated.append(appointment)
+    
+    with transaction.atomic():
+        # bulk_update skips Appointment.save, so the daily rollup is adjusted here
+        Appointment.objects.bulk_update(
+            updated, ['start_datetime', 'end_datetime', 'title', 'status'], batch_size=500
+        )
+        for (day, assigned_to_id, status), delta in stat_deltas.items():
+            if delta:
+                AppointmentDailyStat.adjust_day(day, assigned_to_id, status, delta)
+    
+    if updated:
+        # bulk_update sends no post_save either
+        transaction.on_commit(bump_feed_version)
+        refresh_customer_activity({appointment.customer_id for appointment in updated}, ['next_appointment_at'])
+    return len(updated)
+
+def pull_remote_changes(credential):
+    """Fetch and apply the changes of one connected calendar since its last pull"""
+    provider = get_provider(credential.provider)
+    if not provider.is_configured():
+        return 0
+    
+    changes, sync_token = provider.pull_changes(credential)
+    changed = apply_remote_changes(provider, changes)
+    
+    credential.sync_token = sync_token or ''
+    credential.last_synced_at = timezone.now()
+    credential.save(update_fields=['sync_token', 'last_synced_at'])
+    return changed
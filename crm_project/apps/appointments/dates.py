@@ -0,0 +1,33 @@
+from datetime import datetime, time, timedelta
+
+from django.utils import timezone
+
+def parse_day(value):
+    """Parse 'YYYY-MM-DD' (or an ISO datetime, keeping its date part)"""
+    if hasattr(value, 'year'):
+        return value
+    return datetime.strptime(value[:10], '%Y-%m-%d').date()
+
+def day_start(day):
+    """Aware datetime for local midnight (settings.TIME_ZONE) at the start of day"""
+    return timezone.make_aware(datetime.combine(day, time.min))
+
+def day_range(date_from=None, date_to=None):
+    """Half-open [start, end) datetime bounds covering whole local days.
+    
+    Filtering start_datetime against these bounds keeps the column bare, so
+    the indexes on start_datetime are used (unlike start_datetime__date,
+    which wraps the column in a timezone conversion).
+    """
+    start = day_start(parse_day(date_from)) if date_from else None
+    end = day_start(parse_day(date_to) + timedelta(days=1)) if date_to else None
+    return start, end
+
+def filter_day_range(queryset, date_from=None, date_to=None, field='start_datetime'):
+    """Filter a queryset to the local days between date_from and date_to, inclusive"""
+    start, end = day_range(date_from, date_to)
+    if start:
+        queryset = queryset.filter(**{f'{field}__gte': start})
+    if end:
+        queryset = queryset.filter(**{f'{field}__lt': end})
+    return queryset
@@ -0,0 +1,65 @@
+from django.core.mail import get_connection
+from django.db import transaction
+from django.utils import timezone
+
+from .calendar_sync import retry_delay
+from .models import Appointment, AppointmentEmail
+from .services import APPOINTMENT_EMAILS, NotificationService
+
+MAX_ATTEMPTS = 6
+
+# Emails claimed and sent over one SMTP connection per worker pass
+BATCH_SIZE = 100
+
+def enqueue_appointment_email(appointment, kind):
+    """Queue an appointment email (at most once per appointment and kind)"""
+    flag = APPOINTMENT_EMAILS[kind][2]
+    if flag and getattr(appointment, flag):
+        return None
+    
+    email, created = AppointmentEmail.objects.get_or_create(appointment=appointment, kind=kind)
+    if created:
+        from .tasks import send_email_outbox
+        transaction.on_commit(lambda: send_email_outbox.delay())
+    return email
+
+def send_due_emails(batch_size=BATCH_SIZE):
+    """Send one batch of due emails over a single SMTP connection, returns how many were handled"""
+    service = NotificationService()
+    
+    with transaction.atomic():
+        emails = list(
+            AppointmentEmail.objects.select_for_update(skip_locked=True, of=('self',)).filter(
+                status='pending', next_attempt_at__lte=timezone.now()
+            ).select_related('appointment', 'appointment__customer').order_by('created_at')[:batch_size]
+        )
+        if not emails:
+            return 0
+        
+        connection = get_connection(fail_silently=False)
+        connection.open()
+        try:
+            for email in emails:
+                email.attempts += 1
+                try:
+                    message = service.build_appointment_email(email.appointment, email.kind, connection)
+                    connection.send_messages([message])
+                except Exception as e:
+                    email.last_error = str(e)
+                    if email.attempts >= MAX_ATTEMPTS:
+                        email.status = 'failed'
+                    else:
+                        email.next_attempt_at = timezone.now() + retry_delay(email.attempts)
+                else:
+                    email.status = 'sent'
+                    email.sent_at = timezone.now()
+                    email.last_error = ''
+                    flag = APPOINTMENT_EMAILS[email.kind][2]
+                    if flag:
+                        # update() keeps Appointment.save (and its rollup bookkeeping) out of this
+                        Appointment.objects.filter(pk=email.appointment_id, **{flag: False}).update(**{flag: True})
+                email.save(update_fields=['attempts', 'status', 'next_attempt_at', 'last_error', 'sent_at'])
+        finally:
+            connection.close()
+    
+    return len(emails)
@@ -0,0 +1,46 @@
+import threading
+
+from django.template.loader import get_template
+
+# Appointment emails: subject prefix, template name and the flag set once sent
+APPOINTMENT_EMAILS = {
+    'confirmation': ('Confirmação de Agendamento', 'emails/appointment_confirmation', 'confirmation_sent'),
+    'reminder': ('Lembrete de Agendamento', 'emails/appointment_reminder', 'reminder_sent'),
+    'cancellation': ('Agendamento Cancelado', 'emails/appointment_cancellation', None),
+}
+
+class AppointmentEmailRenderer:
+    """Renders appointment emails from templates compiled once per process.
+    
+    The text and HTML bodies are rendered from one shared context, and a
+    batch of appointments reuses the same compiled templates.
+    """
+    _templates = {}
+    _lock = threading.Lock()
+    
+    def get_templates(self, kind):
+        """(text, html) compiled templates for an email kind, kept warm for the process"""
+        templates = self._templates.get(kind)
+        if templates is None:
+            name = APPOINTMENT_EMAILS[kind][1]
+            with self._lock:
+                templates = self._templates.setdefault(
+                    kind, (get_template(f'{name}.txt'), get_template(f'{name}.html'))
+                )
+        return templates
+    
+    def render(self, appointment, kind, templates=None):
+        """Returns (subject, text_body, html_body)"""
+        text_template, html_template = templates or self.get_templates(kind)
+        context = {
+            'appointment': appointment,
+            'customer': appointment.customer,
+        }
+        subject = f"{APPOINTMENT_EMAILS[kind][0]} - {appointment.title}"
+        return subject, text_template.render(context), html_template.render(context)
+    
+    def render_batch(self, appointments, kind):
+        templates = self.get_templates(kind)
+        return [self.render(appointment, kind, templates) for appointment in appointments]
+
+email_renderer = AppointmentEmailRenderer()
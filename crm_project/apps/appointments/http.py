@@ -0,0 +1,61 @@
+import threading
+import time
+
+import httplib2
+import requests
+from requests.adapters import HTTPAdapter
+
+# Status codes that mean "slow down and try again"
+THROTTLED_STATUSES = (429, 503)
+
+_session = None
+_session_lock = threading.Lock()
+
+def get_http_session():
+    """Process-wide requests.Session, so calendar APIs reuse pooled keep-alive connections"""
+    global _session
+    if _session is None:
+        with _session_lock:
+            if _session is None:
+                session = requests.Session()
+                adapter = HTTPAdapter(pool_connections=10, pool_maxsize=20)
+                session.mount('https://', adapter)
+                session.mount('http://', adapter)
+                _session = session
+    return _session
+
+def retry_after(headers, attempt, max_wait=30):
+    """Seconds to wait before retrying, from Retry-After or exponential backoff"""
+    try:
+        delay = float(headers.get('Retry-After'))
+    except (TypeError, ValueError):
+        delay = 2 ** attempt
+    return min(delay, max_wait)
+
+def throttled_request(method, url, max_retries=3, **kwargs):
+    """Send a request on the shared session, waiting out 429/503 responses"""
+    kwargs.setdefault('timeout', 30)
+    session = get_http_session()
+    for attempt in range(max_retries + 1):
+        response = session.request(method, url, **kwargs)
+        if response.status_code not in THROTTLED_STATUSES or attempt == max_retries:
+            return response
+        time.sleep(retry_after(response.headers, attempt))
+
+class ThrottledHttp:
+    """httplib2-compatible transport for googleapiclient clients.
+    
+    Requests (batches included) go through throttled_request on the shared
+    session, authorized with the given google-auth credentials.
+    """
+    
+    def __init__(self, credentials):
+        self.credentials = credentials
+    
+    def request(self, uri, method='GET', body=None, headers=None, redirections=None, connection_type=None):
+        headers = dict(headers or {})
+        self.credentials.apply(headers)
+        response = throttled_request(method, uri, data=body, headers=headers)
+        info = dict(response.headers)
+        info['status'] = response.status_code
+        return httplib2.Response(info), response.content
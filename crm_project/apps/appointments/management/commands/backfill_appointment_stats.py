@@ -0,0 +1,53 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.db.models import Count
+from django.db.models.functions import TruncDate
+from django.utils import timezone
+
+from apps.appointments.dates import day_range, parse_day
+from apps.appointments.models import Appointment, AppointmentDailyStat
+
+class Command(BaseCommand):
+    help = 'Rebuild the daily appointment statistics rollup from the appointments table'
+    
+    def add_arguments(self, parser):
+        parser.add_argument('--from', dest='date_from', help='First day to rebuild (YYYY-MM-DD)')
+        parser.add_argument('--to', dest='date_to', help='Last day to rebuild (YYYY-MM-DD)')
+        parser.add_argument('--batch-size', type=int, default=1000)
+    
+    def handle(self, *args, **options):
+        appointments = Appointment.objects.order_by()
+        stats = AppointmentDailyStat.objects.all()
+        
+        try:
+            start, end = day_range(options['date_from'], options['date_to'])
+        except ValueError as e:
+            raise CommandError(f'Data inválida: {e}')
+        
+        if start:
+            appointments = appointments.filter(start_datetime__gte=start)
+            stats = stats.filter(day__gte=parse_day(options['date_from']))
+        if end:
+            appointments = appointments.filter(start_datetime__lt=end)
+            stats = stats.filter(day__lte=parse_day(options['date_to']))
+        
+        rows = appointments.annotate(
+            day=TruncDate('start_datetime', tzinfo=timezone.get_current_timezone())
+        ).values('day', 'assigned_to_id', 'status').annotate(total=Count('pk'))
+        
+        with transaction.atomic():
+            stats.delete()
+            created = AppointmentDailyStat.objects.bulk_create(
+                [
+                    AppointmentDailyStat(
+                        day=row['day'],
+                        assigned_to_id=row['assigned_to_id'],
+                        status=row['status'],
+                        count=row['total'],
+                    )
+                    for row in rows.iterator()
+                ],
+                batch_size=options['batch_size']
+            )
+        
+        self.stdout.write(self.style.SUCCESS(f'{len(created)} linhas de estatísticas recriadas.'))
@@ -0,0 +1,55 @@
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.utils import timezone
+
+from apps.appointments.dates import filter_day_range
+from apps.appointments.models import Appointment
+
+class Command(BaseCommand):
+    help = (
+        'Compare query plans and timings of the old start_datetime__date filters '
+        'against the half-open datetime ranges used by the appointment views'
+    )
+    
+    def add_arguments(self, parser):
+        parser.add_argument('--from', dest='date_from', help='First day (YYYY-MM-DD), defaults to today')
+        parser.add_argument('--to', dest='date_to', help='Last day (YYYY-MM-DD), defaults to --from')
+        parser.add_argument('--user', type=int, help='assigned_to id for the per-user queries')
+        parser.add_argument('--repeat', type=int, default=20)
+    
+    def handle(self, *args, **options):
+        date_from = options['date_from'] or timezone.localdate().isoformat()
+        date_to = options['date_to'] or date_from
+        
+        base = Appointment.objects.all()
+        if options['user']:
+            base = base.filter(assigned_to_id=options['user'])
+        
+        cases = [
+            ('date range', base),
+            ('status + date range', base.filter(status__in=['scheduled', 'confirmed'])),
+        ]
+        for label, queryset in cases:
+            before = queryset.filter(
+                start_datetime__date__gte=date_from,
+                start_datetime__date__lte=date_to
+            )
+            after = filter_day_range(queryset, date_from, date_to)
+            
+            self.stdout.write(self.style.MIGRATE_HEADING(f'== {label} =='))
+            self.report('antes (__date)', before, options['repeat'])
+            self.report('depois (intervalo UTC)', after, options['repeat'])
+    
+    def report(self, label, queryset, repeat):
+        started = time.perf_counter()
+        for _ in range(repeat):
+            list(queryset.values_list('pk', flat=True))
+        elapsed_ms = (time.perf_counter() - started) * 1000 / repeat
+        
+        self.stdout.write(self.style.SUCCESS(f'-- {label}: {elapsed_ms:.2f} ms/consulta'))
+        if connection.vendor == 'postgresql':
+            self.stdout.write(queryset.explain(analyze=True, buffers=True))
+        else:
+            self.stdout.write(queryset.explain())
@@ -0,0 +1,55 @@
+import time
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.template.loader import render_to_string
+from django.utils import timezone
+
+from apps.appointments.email_rendering import APPOINTMENT_EMAILS, email_renderer
+from apps.appointments.models import Appointment
+from apps.customers.models import Customer
+
+class Command(BaseCommand):
+    help = 'Measure appointment emails rendered per second (render_to_string vs warm renderer)'
+    
+    def add_arguments(self, parser):
+        parser.add_argument('--count', type=int, default=2000)
+        parser.add_argument('--kind', default='reminder', choices=list(APPOINTMENT_EMAILS))
+    
+    def sample_appointments(self, count):
+        """Unsaved appointments, so only rendering is measured"""
+        start = timezone.now() + timedelta(days=1)
+        appointments = []
+        for i in range(count):
+            customer = Customer(first_name='Cliente', last_name=str(i), email=f'cliente{i}@example.com')
+            appointments.append(Appointment(
+                customer=customer,
+                title=f'Consulta {i}',
+                description='Agendamento de teste',
+                location='Sala 1',
+                start_datetime=start,
+                end_datetime=start + timedelta(hours=1),
+            ))
+        return appointments
+    
+    def handle(self, *args, **options):
+        kind = options['kind']
+        appointments = self.sample_appointments(options['count'])
+        template = APPOINTMENT_EMAILS[kind][1]
+        
+        started = time.perf_counter()
+        for appointment in appointments:
+            context = {'appointment': appointment, 'customer': appointment.customer}
+            render_to_string(f'{template}.html', context)
+            render_to_string(f'{template}.txt', context)
+        self.report('render_to_string (2x por mensagem)', len(appointments), started)
+        
+        started = time.perf_counter()
+        email_renderer.render_batch(appointments, kind)
+        self.report('AppointmentEmailRenderer.render_batch', len(appointments), started)
+    
+    def report(self, label, count, started):
+        elapsed = time.perf_counter() - started
+        self.stdout.write(self.style.SUCCESS(
+            f'{label}: {count / elapsed:,.0f} mensagens/s ({elapsed * 1000:.1f} ms para {count})'
+        ))
@@ -0,0 +1,45 @@
+import json
+from datetime import timezone as dt_timezone
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.utils.dateparse import parse_datetime
+from django.utils import timezone
+
+from apps.appointments.models import CalendarCredential
+
+class Command(BaseCommand):
+    help = 'Store an authorized-user token.json as the Google Calendar credential of a user'
+    
+    def add_arguments(self, parser):
+        parser.add_argument('username')
+        parser.add_argument('token_file', nargs='?', default='token.json')
+    
+    def handle(self, *args, **options):
+        try:
+            user = User.objects.get(username=options['username'])
+        except User.DoesNotExist:
+            raise CommandError(f"Usuário não encontrado: {options['username']}")
+        
+        try:
+            with open(options['token_file'], encoding='utf-8') as handle:
+                data = json.load(handle)
+        except (OSError, ValueError) as e:
+            raise CommandError(f'Não foi possível ler o token: {e}')
+        
+        expiry = parse_datetime(data['expiry']) if data.get('expiry') else None
+        if expiry and timezone.is_naive(expiry):
+            expiry = timezone.make_aware(expiry, dt_timezone.utc)
+        
+        CalendarCredential.objects.update_or_create(
+            user=user,
+            provider='google',
+            defaults={
+                'access_token': data.get('token', ''),
+                'refresh_token': data.get('refresh_token', ''),
+                'token_uri': data.get('token_uri', ''),
+                'scopes': data.get('scopes', []),
+                'expiry': expiry,
+            }
+        )
+        self.stdout.write(self.style.SUCCESS(f'Credencial do Google salva para {user.username}.'))
@@ -0,0 +1,216 @@
+# Generated by Django 5.2.2 on 2026-10-18 04:38
+
+import django.db.models.deletion
+import django.utils.timezone
+import uuid
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+        ('customers', '0003_customer_last_interaction_index'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='AppointmentType',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=100, unique=True)),
+                ('description', models.TextField(blank=True)),
+                ('duration', models.DurationField(help_text='Duração padrão do agendamento')),
+                ('color', models.CharField(default='#007bff', max_length=7)),
+                ('price', models.DecimalField(decimal_places=2, default=0, max_digits=8)),
+            ],
+            options={
+                'verbose_name': 'Tipo de Agendamento',
+                'verbose_name_plural': 'Tipos de Agendamento',
+            },
+        ),
+        migrations.CreateModel(
+            name='Appointment',
+            fields=[
+                ('id', models.UUIDField(default=uuid.uuid4, editable=False, primary_key=True, serialize=False)),
+                ('start_datetime', models.DateTimeField(verbose_name='Data/Hora de Início')),
+                ('end_datetime', models.DateTimeField(verbose_name='Data/Hora de Fim')),
+                ('status', models.CharField(choices=[('scheduled', 'Agendado'), ('confirmed', 'Confirmado'), ('completed', 'Concluído'), ('cancelled', 'Cancelado'), ('no_show', 'Não Compareceu')], default='scheduled', max_length=20)),
+                ('title', models.CharField(max_length=200, verbose_name='Título')),
+                ('description', models.TextField(blank=True, verbose_name='Descrição')),
+                ('location', models.CharField(blank=True, max_length=200, verbose_name='Local')),
+                ('meeting_url', models.URLField(blank=True, verbose_name='URL da Reunião')),
+                ('meeting_id', models.CharField(blank=True, max_length=100, verbose_name='ID da Reunião')),
+                ('reminder_sent', models.BooleanField(default=False)),
+                ('confirmation_sent', models.BooleanField(default=False)),
+                ('google_calendar_event_id', models.CharField(blank=True, max_length=255)),
+                ('outlook_calendar_event_id', models.CharField(blank=True, max_length=255)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('notes', models.TextField(blank=True, verbose_name='Observações')),
+                ('follow_up_required', models.BooleanField(default=False, verbose_name='Requer Follow-up')),
+                ('assigned_to', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='assigned_appointments', to=settings.AUTH_USER_MODEL, verbose_name='Responsável')),
+                ('created_by', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='created_appointments', to=settings.AUTH_USER_MODEL)),
+                ('customer', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='appointments', to='customers.customer')),
+                ('appointment_type', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='appointments.appointmenttype')),
+            ],
+            options={
+                'verbose_name': 'Agendamento',
+                'verbose_name_plural': 'Agendamentos',
+                'ordering': ['start_datetime'],
+            },
+        ),
+        migrations.CreateModel(
+            name='AppointmentNote',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('note', models.TextField(verbose_name='Nota')),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('appointment', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='appointment_notes', to='appointments.appointment')),
+                ('created_by', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'verbose_name': 'Nota do Agendamento',
+                'verbose_name_plural': 'Notas dos Agendamentos',
+                'ordering': ['-created_at'],
+            },
+        ),
+        migrations.CreateModel(
+            name='AvailabilitySlot',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('weekday', models.IntegerField(choices=[(0, 'Segunda-feira'), (1, 'Terça-feira'), (2, 'Quarta-feira'), (3, 'Quinta-feira'), (4, 'Sexta-feira'), (5, 'Sábado'), (6, 'Domingo')])),
+                ('start_time', models.TimeField(verbose_name='Hora de Início')),
+                ('end_time', models.TimeField(verbose_name='Hora de Fim')),
+                ('is_active', models.BooleanField(default=True, verbose_name='Ativo')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='availability_slots', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'verbose_name': 'Horário Disponível',
+                'verbose_name_plural': 'Horários Disponíveis',
+            },
+        ),
+        migrations.CreateModel(
+            name='CalendarCredential',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('provider', models.CharField(choices=[('google', 'Google Calendar'), ('microsoft', 'Microsoft Outlook')], default='google', max_length=20)),
+                ('access_token', models.TextField(blank=True)),
+                ('refresh_token', models.TextField(blank=True)),
+                ('token_uri', models.URLField(blank=True)),
+                ('scopes', models.JSONField(blank=True, default=list)),
+                ('expiry', models.DateTimeField(blank=True, null=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('sync_token', models.TextField(blank=True)),
+                ('last_synced_at', models.DateTimeField(blank=True, null=True)),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='calendar_credentials', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'verbose_name': 'Credencial de Calendário',
+                'verbose_name_plural': 'Credenciais de Calendário',
+            },
+        ),
+        migrations.CreateModel(
+            name='CalendarSyncOperation',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('operation', models.CharField(choices=[('create', 'Criar'), ('update', 'Atualizar'), ('cancel', 'Cancelar')], max_length=20)),
+                ('status', models.CharField(choices=[('pending', 'Pendente'), ('processing', 'Em processamento'), ('done', 'Concluída'), ('failed', 'Falhou')], default='pending', max_length=20)),
+                ('attempts', models.PositiveIntegerField(default=0)),
+                ('next_attempt_at', models.DateTimeField(default=django.utils.timezone.now)),
+                ('last_error', models.TextField(blank=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('processed_at', models.DateTimeField(blank=True, null=True)),
+                ('appointment', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='calendar_operations', to='appointments.appointment')),
+            ],
+            options={
+                'verbose_name': 'Operação de Sincronização de Calendário',
+                'verbose_name_plural': 'Operações de Sincronização de Calendário',
+                'ordering': ['created_at'],
+            },
+        ),
+        migrations.CreateModel(
+            name='SmsDelivery',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('to_number', models.CharField(max_length=20)),
+                ('status', models.CharField(choices=[('sent', 'Enviado'), ('failed', 'Falhou'), ('rate_limited', 'Limitado')], max_length=20)),
+                ('twilio_sid', models.CharField(blank=True, max_length=64)),
+                ('error', models.TextField(blank=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('appointment', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='sms_deliveries', to='appointments.appointment')),
+            ],
+            options={
+                'verbose_name': 'Envio de SMS',
+                'verbose_name_plural': 'Envios de SMS',
+                'ordering': ['-created_at'],
+            },
+        ),
+        migrations.CreateModel(
+            name='AppointmentDailyStat',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('day', models.DateField()),
+                ('status', models.CharField(choices=[('scheduled', 'Agendado'), ('confirmed', 'Confirmado'), ('completed', 'Concluído'), ('cancelled', 'Cancelado'), ('no_show', 'Não Compareceu')], max_length=20)),
+                ('count', models.IntegerField(default=0)),
+                ('assigned_to', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='appointment_daily_stats', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'verbose_name': 'Estatística Diária de Agendamentos',
+                'verbose_name_plural': 'Estatísticas Diárias de Agendamentos',
+                'unique_together': {('day', 'assigned_to', 'status')},
+            },
+        ),
+        migrations.CreateModel(
+            name='AppointmentEmail',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('kind', models.CharField(choices=[('confirmation', 'Confirmação'), ('reminder', 'Lembrete'), ('cancellation', 'Cancelamento')], max_length=20)),
+                ('status', models.CharField(choices=[('pending', 'Pendente'), ('sent', 'Enviado'), ('failed', 'Falhou')], default='pending', max_length=20)),
+                ('attempts', models.PositiveIntegerField(default=0)),
+                ('next_attempt_at', models.DateTimeField(default=django.utils.timezone.now)),
+                ('last_error', models.TextField(blank=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('sent_at', models.DateTimeField(blank=True, null=True)),
+                ('appointment', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='emails', to='appointments.appointment')),
+            ],
+            options={
+                'verbose_name': 'Email de Agendamento',
+                'verbose_name_plural': 'Emails de Agendamento',
+                'ordering': ['created_at'],
+                'indexes': [models.Index(fields=['status', 'next_attempt_at'], name='appointment_email_due_idx')],
+                'unique_together': {('appointment', 'kind')},
+            },
+        ),
+        migrations.AddIndex(
+            model_name='appointment',
+            index=models.Index(fields=['assigned_to', 'start_datetime'], name='appt_assigned_start_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='appointment',
+            index=models.Index(fields=['status', 'start_datetime'], name='appt_status_start_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='appointment',
+            index=models.Index(fields=['start_datetime', 'id'], name='appt_start_id_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='appointment',
+            index=models.Index(condition=models.Q(('reminder_sent', False)), fields=['start_datetime', 'id'], name='appt_reminder_due_idx'),
+        ),
+        migrations.AlterUniqueTogether(
+            name='availabilityslot',
+            unique_together={('user', 'weekday', 'start_time')},
+        ),
+        migrations.AlterUniqueTogether(
+            name='calendarcredential',
+            unique_together={('user', 'provider')},
+        ),
+        migrations.AddIndex(
+            model_name='calendarsyncoperation',
+            index=models.Index(fields=['status', 'next_attempt_at'], name='calendar_sync_due_idx'),
+        ),
+    ]
@@ -1,4 +1,7 @@
-from django.db import models
+from django.db import models, IntegrityError, transaction
+from django.db.models import F, Q
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
 from django.contrib.auth.models import User
 from django.utils import timezone
 from django.urls import reverse
@@ -67,27 +70,318 @@ class Appointment(models.Model):
     # Metadata
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
+    created_by = models.ForeignKey(
+        User, 
+        on_delete=models.SET_NULL, 
+        null=True, 
+        blank=True,
+        related_name='created_appointments'
+    )
     
-    def __str__(self):
-        return f"{self.title} - {self.customer.name} ({self.start_datetime})"
+    # Notes and Follow-up
+    notes = models.TextField(blank=True, verbose_name='Observações')
+    follow_up_required = models.BooleanField(default=False, verbose_name='Requer Follow-up')
     
-    def get_absolute_url(self):
-        return reverse('appointments:detail', kwargs={'pk': self.pk})
+    def __str__(self):
+        return f"{self.title} - {self.customer.full_name} ({self.start_datetime.strftime('%d/%m/%Y %H:%M')})"
     
     @property
     def duration(self):
-        """Calculate appointment duration"""
         return self.end_datetime - self.start_datetime
     
+    @property
     def is_past(self):
-        """Check if appointment is in the past"""
         return self.end_datetime < timezone.now()
     
+    @property
     def is_today(self):
-        """Check if appointment is today"""
-        return self.start_datetime.date() == timezone.now().date()
+        today = timezone.now().date()
+        return self.start_datetime.date() == today
+    
+    def get_absolute_url(self):
+        return reverse('appointments:detail', kwargs={'pk': self.pk})
+    
+    def can_be_cancelled(self):
+        """Check if appointment can still be cancelled"""
+        return self.status in ['scheduled', 'confirmed'] and not self.is_past
+    
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # Lets refresh_customer_next_appointment also refresh a customer the appointment was moved from
+        instance._loaded_customer_id = instance.__dict__.get('customer_id')
+        return instance
+    
+    def save(self, *args, **kwargs):
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None:
+            # update_fields may name 'assigned_to' or 'assigned_to_id', compare by attname
+            attnames = {self._meta.get_field(name).attname for name in update_fields}
+            if not attnames & set(AppointmentDailyStat.TRACKED_FIELDS):
+                return super().save(*args, **kwargs)
+        
+        with transaction.atomic():
+            previous = None
+            if not self._state.adding:
+                previous = Appointment.objects.filter(pk=self.pk).values_list(
+                    *AppointmentDailyStat.TRACKED_FIELDS
+                ).first()
+            
+            super().save(*args, **kwargs)
+            
+            current = (self.start_datetime, self.assigned_to_id, self.status)
+            if previous != current:
+                if previous is not None:
+                    AppointmentDailyStat.adjust(*previous, -1)
+                AppointmentDailyStat.adjust(*current, 1)
     
     class Meta:
         verbose_name = 'Agendamento'
         verbose_name_plural = 'Agendamentos'
-        ordering = ['start_datetime']
\ No newline at end of file
+        ordering = ['start_datetime']
+        indexes = [
+            models.Index(fields=['assigned_to', 'start_datetime'], name='appt_assigned_start_idx'),
+            models.Index(fields=['status', 'start_datetime'], name='appt_status_start_idx'),
+            # Keyset pagination of the appointment list
+            models.Index(fields=['start_datetime', 'id'], name='appt_start_id_idx'),
+            models.Index(
+                fields=['start_datetime', 'id'],
+                condition=Q(reminder_sent=False),
+                name='appt_reminder_due_idx'
+            ),
+        ]
+
+class AppointmentNote(models.Model):
+    """Notes added to appointments"""
+    appointment = models.ForeignKey('Appointment', on_delete=models.CASCADE, related_name='appointment_notes')
+    note = models.TextField(verbose_name='Nota')
+    created_at = models.DateTimeField(auto_now_add=True)
+    created_by = models.ForeignKey(User, on_delete=models.CASCADE)
+    
+    def __str__(self):
+        return f"Nota para {self.appointment.title}"
+    
+    class Meta:
+        verbose_name = 'Nota do Agendamento'
+        verbose_name_plural = 'Notas dos Agendamentos'
+        ordering = ['-created_at']
+
+class AvailabilitySlot(models.Model):
+    """Define available time slots for appointments"""
+    WEEKDAY_CHOICES = [
+        (0, 'Segunda-feira'),
+        (1, 'Terça-feira'),
+        (2, 'Quarta-feira'),
+        (3, 'Quinta-feira'),
+        (4, 'Sexta-feira'),
+        (5, 'Sábado'),
+        (6, 'Domingo'),
+    ]
+    
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='availability_slots')
+    weekday = models.IntegerField(choices=WEEKDAY_CHOICES)
+    start_time = models.TimeField(verbose_name='Hora de Início')
+    end_time = models.TimeField(verbose_name='Hora de Fim')
+    is_active = models.BooleanField(default=True, verbose_name='Ativo')
+    
+    def __str__(self):
+        return f"{self.user.get_full_name()} - {self.get_weekday_display()} ({self.start_time}-{self.end_time})"
+    
+    class Meta:
+        verbose_name = 'Horário Disponível'
+        verbose_name_plural = 'Horários Disponíveis'
+        unique_together = ['user', 'weekday', 'start_time']
+
+class AppointmentDailyStat(models.Model):
+    """Daily appointment counts per assigned user and status, kept in sync on save/delete"""
+    TRACKED_FIELDS = ['start_datetime', 'assigned_to_id', 'status']
+    
+    day = models.DateField()
+    assigned_to = models.ForeignKey(User, on_delete=models.CASCADE, related_name='appointment_daily_stats')
+    status = models.CharField(max_length=20, choices=Appointment.STATUS_CHOICES)
+    count = models.IntegerField(default=0)
+    
+    def __str__(self):
+        return f"{self.day} - {self.assigned_to_id} - {self.status}: {self.count}"
+    
+    @classmethod
+    def adjust(cls, start_datetime, assigned_to_id, status, delta):
+        """Add delta to the bucket of an appointment, creating the row on first use"""
+        cls.adjust_day(timezone.localdate(start_datetime), assigned_to_id, status, delta)
+    
+    @classmethod
+    def adjust_day(cls, day, assigned_to_id, status, delta):
+        bucket = cls.objects.filter(day=day, assigned_to_id=assigned_to_id, status=status)
+        if bucket.update(count=F('count') + delta) or delta < 0:
+            return
+        
+        try:
+            with transaction.atomic():
+                cls.objects.create(day=day, assigned_to_id=assigned_to_id, status=status, count=delta)
+        except IntegrityError:
+            # Created concurrently by another request
+            bucket.update(count=F('count') + delta)
+    
+    class Meta:
+        verbose_name = 'Estatística Diária de Agendamentos'
+        verbose_name_plural = 'Estatísticas Diárias de Agendamentos'
+        unique_together = ['day', 'assigned_to', 'status']
+
+@receiver(post_delete, sender=Appointment)
+def remove_appointment_from_stats(sender, instance, **kwargs):
+    AppointmentDailyStat.adjust(instance.start_datetime, instance.assigned_to_id, instance.status, -1)
+
+@receiver(post_save, sender=Appointment)
+@receiver(post_delete, sender=Appointment)
+@receiver(post_save, sender=AppointmentType)
+@receiver(post_save, sender=Customer)
+def refresh_calendar_feed(sender, **kwargs):
+    # Feed entries show the type color and customer name, so those invalidate too.
+    # The bump waits for the commit, so a feed built in between is not cached under the new version
+    from .calendar_feed import bump_feed_version
+    transaction.on_commit(bump_feed_version)
+
+@receiver(post_save, sender=Appointment)
+@receiver(post_delete, sender=Appointment)
+def refresh_customer_next_appointment(sender, instance, **kwargs):
+    update_fields = kwargs.get('update_fields')
+    customer_saved = update_fields is None
+    if update_fields is not None:
+        attnames = {sender._meta.get_field(name).attname for name in update_fields}
+        if not attnames & {'start_datetime', 'status', 'customer_id'}:
+            return
+        customer_saved = 'customer_id' in attnames
+    
+    customer_ids = {instance.customer_id}
+    previous = getattr(instance, '_loaded_customer_id', None)
+    if previous is not None:
+        customer_ids.add(previous)
+    if customer_saved:
+        instance._loaded_customer_id = instance.customer_id
+    
+    from apps.customers.activity import refresh_customer_activity
+    refresh_customer_activity(customer_ids, ['next_appointment_at'])
+
+class CalendarSyncOperation(models.Model):
+    """Outbox of calendar operations, drained asynchronously by the calendar sync worker"""
+    OPERATION_CHOICES = [
+        ('create', 'Criar'),
+        ('update', 'Atualizar'),
+        ('cancel', 'Cancelar'),
+    ]
+    
+    STATUS_CHOICES = [
+        ('pending', 'Pendente'),
+        ('processing', 'Em processamento'),
+        ('done', 'Concluída'),
+        ('failed', 'Falhou'),
+    ]
+    
+    appointment = models.ForeignKey(Appointment, on_delete=models.CASCADE, related_name='calendar_operations')
+    operation = models.CharField(max_length=20, choices=OPERATION_CHOICES)
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='pending')
+    attempts = models.PositiveIntegerField(default=0)
+    next_attempt_at = models.DateTimeField(default=timezone.now)
+    last_error = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    processed_at = models.DateTimeField(null=True, blank=True)
+    
+    def __str__(self):
+        return f"{self.get_operation_display()} - {self.appointment_id} ({self.get_status_display()})"
+    
+    class Meta:
+        verbose_name = 'Operação de Sincronização de Calendário'
+        verbose_name_plural = 'Operações de Sincronização de Calendário'
+        ordering = ['created_at']
+        indexes = [
+            models.Index(fields=['status', 'next_attempt_at'], name='calendar_sync_due_idx'),
+        ]
+
+class CalendarCredential(models.Model):
+    """OAuth credentials for a user's external calendar account"""
+    PROVIDER_CHOICES = [
+        ('google', 'Google Calendar'),
+        ('microsoft', 'Microsoft Outlook'),
+    ]
+    
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='calendar_credentials')
+    provider = models.CharField(max_length=20, choices=PROVIDER_CHOICES, default='google')
+    access_token = models.TextField(blank=True)
+    refresh_token = models.TextField(blank=True)
+    token_uri = models.URLField(blank=True)
+    scopes = models.JSONField(default=list, blank=True)
+    expiry = models.DateTimeField(null=True, blank=True)
+    updated_at = models.DateTimeField(auto_now=True)
+    
+    # Incremental pull state: Google nextSyncToken or Graph deltaLink
+    sync_token = models.TextField(blank=True)
+    last_synced_at = models.DateTimeField(null=True, blank=True)
+    
+    def __str__(self):
+        return f"{self.user} - {self.get_provider_display()}"
+    
+    class Meta:
+        verbose_name = 'Credencial de Calendário'
+        verbose_name_plural = 'Credenciais de Calendário'
+        unique_together = ['user', 'provider']
+
+class AppointmentEmail(models.Model):
+    """Outbox of appointment emails, sent by a Celery worker over a pooled SMTP connection"""
+    KIND_CHOICES = [
+        ('confirmation', 'Confirmação'),
+        ('reminder', 'Lembrete'),
+        ('cancellation', 'Cancelamento'),
+    ]
+    
+    STATUS_CHOICES = [
+        ('pending', 'Pendente'),
+        ('sent', 'Enviado'),
+        ('failed', 'Falhou'),
+    ]
+    
+    appointment = models.ForeignKey(Appointment, on_delete=models.CASCADE, related_name='emails')
+    kind = models.CharField(max_length=20, choices=KIND_CHOICES)
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='pending')
+    attempts = models.PositiveIntegerField(default=0)
+    next_attempt_at = models.DateTimeField(default=timezone.now)
+    last_error = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    sent_at = models.DateTimeField(null=True, blank=True)
+    
+    def __str__(self):
+        return f"{self.get_kind_display()} - {self.appointment_id} ({self.get_status_display()})"
+    
+    class Meta:
+        verbose_name = 'Email de Agendamento'
+        verbose_name_plural = 'Emails de Agendamento'
+        ordering = ['created_at']
+        # One email of each kind per appointment, so nothing is ever sent twice
+        unique_together = ['appointment', 'kind']
+        indexes = [
+            models.Index(fields=['status', 'next_attempt_at'], name='appointment_email_due_idx'),
+        ]
+
+class SmsDelivery(models.Model):
+    """Result of each SMS sent through Twilio"""
+    STATUS_CHOICES = [
+        ('sent', 'Enviado'),
+        ('failed', 'Falhou'),
+        ('rate_limited', 'Limitado'),
+    ]
+    
+    appointment = models.ForeignKey(
+        Appointment, on_delete=models.SET_NULL, null=True, blank=True, related_name='sms_deliveries'
+    )
+    to_number = models.CharField(max_length=20)
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES)
+    twilio_sid = models.CharField(max_length=64, blank=True)
+    error = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    
+    def __str__(self):
+        return f"{self.to_number} - {self.get_status_display()}"
+    
+    class Meta:
+        verbose_name = 'Envio de SMS'
+        verbose_name_plural = 'Envios de SMS'
+        ordering = ['-created_at']
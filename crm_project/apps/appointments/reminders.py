@@ -0,0 +1,97 @@
+import logging
+from datetime import timedelta
+
+from django.core.cache import cache
+from django.core.mail import get_connection
+from django.db.models import Q
+from django.utils import timezone
+
+from .models import Appointment
+from .services import NotificationService
+
+logger = logging.getLogger(__name__)
+
+# Appointments starting within this window get their reminder
+REMINDER_WINDOW = timedelta(hours=24)
+
+BATCH_SIZE = 500
+
+# Prevents overlapping beat runs from sending the same reminders twice
+REMINDER_LOCK_KEY = 'appointments:reminders:lock'
+REMINDER_LOCK_TIMEOUT = 60 * 60
+
+def due_reminders(now=None):
+    """Appointments in the reminder window still waiting for their reminder.
+    
+    Served by the partial index on start_datetime WHERE reminder_sent = false.
+    """
+    now = now or timezone.now()
+    return Appointment.objects.filter(
+        reminder_sent=False,
+        status__in=['scheduled', 'confirmed'],
+        start_datetime__gte=now,
+        start_datetime__lt=now + REMINDER_WINDOW,
+    ).select_related('customer').order_by('start_datetime', 'id')
+
+def reminder_batches(queryset, batch_size=BATCH_SIZE):
+    """Yield the queryset in keyset-paginated batches on (start_datetime, id)"""
+    last = None
+    while True:
+        page = queryset
+        if last:
+            page = page.filter(
+                Q(start_datetime__gt=last[0]) | Q(start_datetime=last[0], id__gt=last[1])
+            )
+        batch = list(page[:batch_size])
+        if not batch:
+            return
+        yield batch
+        last = (batch[-1].start_datetime, batch[-1].id)
+
+def send_reminder_batch(service, connection, batch):
+    """Send email (and SMS) reminders for one batch, returns the ids that were reminded.
+    
+    reminder_sent is set as soon as the emails are out, so an SMS failure
+    never gets the same customers emailed again; SMS results are kept in
+    SmsDelivery.
+    """
+    reminded = []
+    messages = service.build_appointment_emails(batch, 'reminder', connection)
+    for appointment, message in zip(batch, messages):
+        try:
+            connection.send_messages([message])
+        except Exception:
+            logger.exception("Error sending reminder email for appointment %s", appointment.pk)
+            continue
+        reminded.append(appointment)
+    
+    # One UPDATE per batch instead of a save() per appointment
+    Appointment.objects.filter(
+        pk__in=[appointment.pk for appointment in reminded], reminder_sent=False
+    ).update(reminder_sent=True)
+    
+    try:
+        service.send_sms_reminders(reminded)
+    except Exception:
+        logger.exception("Error sending reminder SMS for %s appointments", len(reminded))
+    return [appointment.pk for appointment in reminded]
+
+def send_due_reminders(batch_size=BATCH_SIZE):
+    """Send every due reminder batch by batch, returns how many were sent"""
+    if not cache.add(REMINDER_LOCK_KEY, True, timeout=REMINDER_LOCK_TIMEOUT):
+        return 0
+    
+    service = NotificationService()
+    connection = get_connection(fail_silently=False)
+    sent = 0
+    try:
+        connection.open()
+        for batch in reminder_batches(due_reminders(), batch_size):
+            sent += len(send_reminder_batch(service, connection, batch))
+            # Renewed after every batch, so a long run never loses the lock
+            cache.touch(REMINDER_LOCK_KEY, REMINDER_LOCK_TIMEOUT)
+    finally:
+        connection.close()
+        cache.delete(REMINDER_LOCK_KEY)
+    
+    return sent
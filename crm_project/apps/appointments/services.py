@@ -1,15 +1,138 @@
-import os
-import json
-from datetime import datetime, timedelta
+import threading
+import time
+from datetime import datetime, timedelta, timezone as dt_timezone
 from django.conf import settings
-from django.core.mail import send_mail
-from django.template.loader import render_to_string
+from django.utils import timezone
+from django.core.mail import EmailMultiAlternatives
 from google.oauth2.credentials import Credentials
 from google.auth.transport.requests import Request
 from google_auth_oauthlib.flow import Flow
 from googleapiclient.discovery import build
 import requests
 
+from .models import Appointment, CalendarCredential
+from .http import ThrottledHttp, get_http_session
+from .email_rendering import APPOINTMENT_EMAILS, email_renderer
+from .sms import send_sms_batch, sms_reminder_body
+
+# Cached Calendar API clients are rebuilt after this many seconds
+CLIENT_CACHE_TTL = 30 * 60
+
+# Google accepts at most 50 calls per batch request
+GOOGLE_BATCH_SIZE = 50
+
+# Access tokens are refreshed this long before they expire
+TOKEN_REFRESH_MARGIN = timedelta(minutes=5)
+
+class CalendarClientCache:
+    """Process-level cache of calendar API clients keyed by user, with TTL eviction"""
+    
+    def __init__(self, ttl=CLIENT_CACHE_TTL):
+        self.ttl = ttl
+        self._entries = {}
+        self._lock = threading.Lock()
+    
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            if entry[2] < time.monotonic():
+                del self._entries[key]
+                return None
+            return entry[0], entry[1]
+    
+    def set(self, key, client, credentials):
+        with self._lock:
+            self._entries[key] = (client, credentials, time.monotonic() + self.ttl)
+    
+    def evict(self, key):
+        with self._lock:
+            self._entries.pop(key, None)
+
+google_client_cache = CalendarClientCache()
+
+def google_credentials_from_record(record):
+    """Build google-auth Credentials from a stored CalendarCredential"""
+    expiry = None
+    if record.expiry:
+        # google-auth works with naive UTC datetimes
+        expiry = timezone.make_naive(record.expiry, dt_timezone.utc)
+    return Credentials(
+        token=record.access_token or None,
+        refresh_token=record.refresh_token or None,
+        token_uri=record.token_uri or 'https://oauth2.googleapis.com/token',
+        client_id=settings.GOOGLE_CALENDAR_CLIENT_ID,
+        client_secret=settings.GOOGLE_CALENDAR_CLIENT_SECRET,
+        scopes=record.scopes or None,
+        expiry=expiry,
+    )
+
+def needs_refresh(creds):
+    """True when the token is missing or expires within TOKEN_REFRESH_MARGIN"""
+    if not creds.token:
+        return True
+    if creds.expiry is None:
+        return False
+    return creds.expiry - datetime.utcnow() < TOKEN_REFRESH_MARGIN
+
+def refresh_google_credentials(user_id, creds):
+    """Refresh an access token and persist it so other processes reuse it"""
+    creds.refresh(Request(session=get_http_session()))
+    CalendarCredential.objects.filter(user_id=user_id, provider='google').update(
+        access_token=creds.token,
+        expiry=timezone.make_aware(creds.expiry, dt_timezone.utc) if creds.expiry else None,
+    )
+
+def google_event_body(appointment, new_event=False):
+    """Google Calendar event resource for an appointment"""
+    event = {
+        'summary': appointment.title,
+        'description': f"Cliente: {appointment.customer.full_name}\n{appointment.description}",
+        'start': {
+            'dateTime': appointment.start_datetime.isoformat(),
+            'timeZone': settings.TIME_ZONE,
+        },
+        'end': {
+            'dateTime': appointment.end_datetime.isoformat(),
+            'timeZone': settings.TIME_ZONE,
+        },
+    }
+    
+    if new_event:
+        event['attendees'] = [
+            {'email': appointment.customer.email},
+        ]
+        event['reminders'] = {
+            'useDefault': False,
+            'overrides': [
+                {'method': 'email', 'minutes': 24 * 60},  # 24 hours before
+                {'method': 'popup', 'minutes': 60},       # 1 hour before
+            ],
+        }
+        if appointment.location:
+            event['location'] = appointment.location
+    
+    return event
+
+def google_event_request(service, operation, appointment):
+    """Unexecuted API request for a create/update/cancel operation (None if nothing to do)"""
+    event_id = appointment.google_calendar_event_id
+    if operation == 'cancel':
+        if not event_id:
+            return None
+        return service.events().delete(calendarId='primary', eventId=event_id)
+    
+    # A create retried after the event was already inserted becomes an update
+    if event_id:
+        return service.events().update(
+            calendarId='primary',
+            eventId=event_id,
+            body=google_event_body(appointment)
+        )
+    
+    return service.events().insert(calendarId='primary', body=google_event_body(appointment, new_event=True))
+
 class CalendarService:
     """Service for calendar integrations"""
     
@@ -17,286 +140,209 @@ class CalendarService:
         self.google_credentials = None
         self.outlook_credentials = None
     
-    def get_google_calendar_service(self):
-        """Get Google Calendar service"""
-        if not settings.GOOGLE_CALENDAR_CLIENT_ID:
+    def get_google_calendar_service(self, user):
+        """Get the Google Calendar client for a user's account.
+        
+        Clients are cached per user for CLIENT_CACHE_TTL, so the hot path does
+        no database access, file I/O or discovery building; tokens are
+        refreshed shortly before they expire.
+        """
+        if not settings.GOOGLE_CALENDAR_CLIENT_ID or user is None:
             return None
         
-        # Load credentials from user settings or database
-        # This is a simplified version - in production, store user credentials securely
-        creds = None
-        if os.path.exists('token.json'):
-            creds = Credentials.from_authorized_user_file('token.json')
+        cached = google_client_cache.get(user.pk)
+        if cached:
+            service, creds = cached
+            if needs_refresh(creds):
+                # The client's transport holds this credentials object, refreshing it in place is enough
+                try:
+                    refresh_google_credentials(user.pk, creds)
+                except Exception:
+                    # Re-read the stored credentials next time, the user may have reconnected
+                    google_client_cache.evict(user.pk)
+                    raise
+            return service
+        
+        record = CalendarCredential.objects.filter(user=user, provider='google').first()
+        if not record or not (record.access_token or record.refresh_token):
+            # User has not connected a Google account yet
+            return None
         
-        if not creds or not creds.valid:
-            if creds and creds.expired and creds.refresh_token:
-                creds.refresh(Request())
-            else:
-                # Need to implement OAuth flow for first-time setup
+        creds = google_credentials_from_record(record)
+        if needs_refresh(creds):
+            if not creds.refresh_token:
                 return None
+            refresh_google_credentials(user.pk, creds)
         
-        return build('calendar', 'v3', credentials=creds)
+        # Event writes share the pooled session and its 429/503 handling
+        service = build('calendar', 'v3', http=ThrottledHttp(creds), cache_discovery=False)
+        google_client_cache.set(user.pk, service, creds)
+        return service
     
-    def create_appointment_event(self, appointment):
+    def create_appointment_event(self, appointment, fail_silently=True):
         """Create calendar event for appointment"""
-        service = self.get_google_calendar_service()
+        service = self.get_google_calendar_service(appointment.assigned_to)
         if not service:
             return
         
-        event = {
-            'summary': appointment.title,
-            'description': f"Cliente: {appointment.customer.full_name}\n{appointment.description}",
-            'start': {
-                'dateTime': appointment.start_datetime.isoformat(),
-                'timeZone': settings.TIME_ZONE,
-            },
-            'end': {
-                'dateTime': appointment.end_datetime.isoformat(),
-                'timeZone': settings.TIME_ZONE,
-            },
-            'attendees': [
-                {'email': appointment.customer.email},
-            ],
-            'reminders': {
-                'useDefault': False,
-                'overrides': [
-                    {'method': 'email', 'minutes': 24 * 60},  # 24 hours before
-                    {'method': 'popup', 'minutes': 60},       # 1 hour before
-                ],
-            },
-        }
-        
-        if appointment.location:
-            event['location'] = appointment.location
-        
         try:
-            created_event = service.events().insert(calendarId='primary', body=event).execute()
+            created_event = google_event_request(service, 'create', appointment).execute()
             appointment.google_calendar_event_id = created_event['id']
             appointment.save(update_fields=['google_calendar_event_id'])
         except Exception as e:
+            if not fail_silently:
+                raise
             print(f"Error creating Google Calendar event: {e}")
     
-    def update_appointment_event(self, appointment):
+    def update_appointment_event(self, appointment, fail_silently=True):
         """Update existing calendar event"""
         if not appointment.google_calendar_event_id:
-            return self.create_appointment_event(appointment)
+            return self.create_appointment_event(appointment, fail_silently=fail_silently)
         
-        service = self.get_google_calendar_service()
+        service = self.get_google_calendar_service(appointment.assigned_to)
         if not service:
             return
         
-        event = {
-            'summary': appointment.title,
-            'description': f"Cliente: {appointment.customer.full_name}\n{appointment.description}",
-            'start': {
-                'dateTime': appointment.start_datetime.isoformat(),
-                'timeZone': settings.TIME_ZONE,
-            },
-            'end': {
-                'dateTime': appointment.end_datetime.isoformat(),
-                'timeZone': settings.TIME_ZONE,
-            },
-        }
-        
         try:
-            service.events().update(
-                calendarId='primary',
-                eventId=appointment.google_calendar_event_id,
-                body=event
-            ).execute()
+            google_event_request(service, 'update', appointment).execute()
         except Exception as e:
+            if not fail_silently:
+                raise
             print(f"Error updating Google Calendar event: {e}")
     
-    def cancel_appointment_event(self, appointment):
+    def cancel_appointment_event(self, appointment, fail_silently=True):
         """Cancel/delete calendar event"""
         if not appointment.google_calendar_event_id:
             return
         
-        service = self.get_google_calendar_service()
+        service = self.get_google_calendar_service(appointment.assigned_to)
         if not service:
             return
         
         try:
-            service.events().delete(
-                calendarId='primary',
-                eventId=appointment.google_calendar_event_id
-            ).execute()
+            google_event_request(service, 'cancel', appointment).execute()
         except Exception as e:
+            if not fail_silently:
+                raise
             print(f"Error cancelling Google Calendar event: {e}")
-
-class NotificationService:
-    """Service for sending notifications"""
     
-    def send_appointment_confirmation(self, appointment):
-        """Send appointment confirmation email"""
-        subject = f"Confirmação de Agendamento - {appointment.title}"
+    def sync_appointments_batch(self, operations):
+        """Send (operation, appointment) pairs through Google batch requests.
         
-        context = {
-            'appointment': appointment,
-            'customer': appointment.customer,
-        }
+        Operations are grouped per assigned user (each has its own client) and
+        sent GOOGLE_BATCH_SIZE at a time. Returns a list with one entry per
+        operation, None on success or the exception for that item; new event
+        ids are written back to google_calendar_event_id in one bulk update.
+        """
+        results = [None] * len(operations)
+        created = []
         
-        html_message = render_to_string('emails/appointment_confirmation.html', context)
-        plain_message = render_to_string('emails/appointment_confirmation.txt', context)
+        by_user = {}
+        for index, (operation, appointment) in enumerate(operations):
+            by_user.setdefault(appointment.assigned_to_id, []).append(index)
         
+        for indexes in by_user.values():
+            try:
+                service = self.get_google_calendar_service(operations[indexes[0]][1].assigned_to)
+            except Exception as e:
+                # e.g. a revoked refresh token: only this user's operations fail
+                for index in indexes:
+                    results[index] = e
+                continue
+            if not service:
+                continue
+            
+            for start in range(0, len(indexes), GOOGLE_BATCH_SIZE):
+                chunk = indexes[start:start + GOOGLE_BATCH_SIZE]
+                
+                def callback(request_id, response, exception):
+                    index = int(request_id)
+                    operation, appointment = operations[index]
+                    if exception is not None:
+                        results[index] = exception
+                    elif response and not appointment.google_calendar_event_id:
+                        # Insert (create, or update of an event never created)
+                        appointment.google_calendar_event_id = response['id']
+                        created.append(appointment)
+                
+                batch = service.new_batch_http_request(callback=callback)
+                queued = 0
+                for index in chunk:
+                    operation, appointment = operations[index]
+                    request = google_event_request(service, operation, appointment)
+                    if request is not None:
+                        batch.add(request, request_id=str(index))
+                        queued += 1
+                
+                if not queued:
+                    continue
+                try:
+                    batch.execute()
+                except Exception as e:
+                    # Transport failure: every item of this batch failed
+                    for index in chunk:
+                        if results[index] is None:
+                            results[index] = e
+        
+        if created:
+            Appointment.objects.bulk_update(created, ['google_calendar_event_id'])
+        return results
+
+class NotificationService:
+    """Service for sending notifications"""
+    
+    def build_appointment_email(self, appointment, kind, connection=None):
+        """Render an appointment email (plain text with an HTML alternative)"""
+        return self.email_message(appointment, *email_renderer.render(appointment, kind), connection)
+    
+    def build_appointment_emails(self, appointments, kind, connection=None):
+        """Render the same kind of email for a batch of appointments in one pass"""
+        return [
+            self.email_message(appointment, *rendered, connection)
+            for appointment, rendered in zip(appointments, email_renderer.render_batch(appointments, kind))
+        ]
+    
+    def email_message(self, appointment, subject, text_body, html_body, connection=None):
+        message = EmailMultiAlternatives(
+            subject=subject,
+            body=text_body,
+            from_email=settings.DEFAULT_FROM_EMAIL,
+            to=[appointment.customer.email],
+            connection=connection,
+        )
+        message.attach_alternative(html_body, 'text/html')
+        return message
+    
+    def send_appointment_email(self, appointment, kind):
         try:
-            send_mail(
-                subject=subject,
-                message=plain_message,
-                html_message=html_message,
-                from_email=settings.DEFAULT_FROM_EMAIL,
-                recipient_list=[appointment.customer.email],
-                fail_silently=False,
-            )
-            appointment.confirmation_sent = True
-            appointment.save(update_fields=['confirmation_sent'])
+            self.build_appointment_email(appointment, kind).send(fail_silently=False)
         except Exception as e:
-            print(f"Error sending confirmation email: {e}")
+            print(f"Error sending {kind} email: {e}")
+            return
+        
+        flag = APPOINTMENT_EMAILS[kind][2]
+        if flag:
+            setattr(appointment, flag, True)
+            appointment.save(update_fields=[flag])
+    
+    def send_appointment_confirmation(self, appointment):
+        """Send appointment confirmation email"""
+        self.send_appointment_email(appointment, 'confirmation')
     
     def send_appointment_reminder(self, appointment):
         """Send appointment reminder"""
-        subject = f"Lembrete de Agendamento - {appointment.title}"
-        
-        context = {
-            'appointment': appointment,
-            'customer': appointment.customer,
-        }
-        
-        html_message = render_to_string('emails/appointment_reminder.html', context)
-        plain_message = render_to_string('emails/appointment_reminder.txt', context)
-        
-        try:
-            send_mail(
-                subject=subject,
-                message=plain_message,
-                html_message=html_message,
-                from_email=settings.DEFAULT_FROM_EMAIL,
-                recipient_list=[appointment.customer.email],
-                fail_silently=False,
-            )
-            appointment.reminder_sent = True
-            appointment.save(update_fields=['reminder_sent'])
-        except Exception as e:
-            print(f"Error sending reminder email: {e}")
+        self.send_appointment_email(appointment, 'reminder')
     
     def send_appointment_cancellation(self, appointment):
         """Send appointment cancellation notification"""
-        subject = f"Agendamento Cancelado - {appointment.title}"
-        
-        context = {
-            'appointment': appointment,
-            'customer': appointment.customer,
-        }
-        
-        html_message = render_to_string('emails/appointment_cancellation.html', context)
-        plain_message = render_to_string('emails/appointment_cancellation.txt', context)
-        
-        try:
-            send_mail(
-                subject=subject,
-                message=plain_message,
-                html_message=html_message,
-                from_email=settings.DEFAULT_FROM_EMAIL,
-                recipient_list=[appointment.customer.email],
-                fail_silently=False,
-            )
-        except Exception as e:
-            print(f"Error sending cancellation email: {e}")
+        self.send_appointment_email(appointment, 'cancellation')
     
     def send_sms_reminder(self, appointment):
         """Send SMS reminder using Twilio"""
-        if not settings.TWILIO_ACCOUNT_SID or not appointment.customer.phone:
-            return
-        
-        from twilio.rest import Client
-        
-        client = Client(settings.TWILIO_ACCOUNT_SID, settings.TWILIO_AUTH_TOKEN)
-        
-        message_body = f"""
-        Lembrete: Você tem um agendamento marcado para {appointment.start_datetime.strftime('%d/%m/%Y às %H:%M')}.
-        
-        {appointment.title}
-        Local: {appointment.location or 'A definir'}
-        
-        Para reagendar ou cancelar, entre em contato conosco.
-        """
-        
-        try:
-            client.messages.create(
-                body=message_body.strip(),
-                from_=settings.TWILIO_PHONE_NUMBER,
-                to=appointment.customer.phone
-            )
-        except Exception as e:
-            print(f"Error sending SMS: {e}")
-
-            at = models.DateTimeField(auto_now=True)
-    created_by = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, blank=True)
-    
-    # Additional Information
-    notes = models.TextField(blank=True, verbose_name='Observações')
-    
-    def __str__(self):
-        return f"{self.first_name} {self.last_name}"
-    
-    @property
-    def full_name(self):
-        return f"{self.first_name} {self.last_name}"
-    
-    def get_absolute_url(self):
-        return reverse('customers:detail', kwargs={'pk': self.pk})
-    
-    class Meta:
-        verbose_name = 'Cliente'
-        verbose_name_plural = 'Clientes'
-        ordering = ['-created_at']
-
-class CustomerInteraction(models.Model):
-    """Track all customer interactions"""
-    INTERACTION_TYPES = [
-        ('email', 'Email'),
-        ('phone', 'Telefone'),
-        ('meeting', 'Reunião'),
-        ('note', 'Nota'),
-        ('purchase', 'Compra'),
-        ('support', 'Suporte'),
-    ]
-    
-    customer = models.ForeignKey(Customer, on_delete=models.CASCADE, related_name='interactions')
-    interaction_type = models.CharField(max_length=20, choices=INTERACTION_TYPES)
-    subject = models.CharField(max_length=200)
-    description = models.TextField()
-    created_at = models.DateTimeField(auto_now_add=True)
-    created_by = models.ForeignKey(User, on_delete=models.CASCADE)
-    
-    def __str__(self):
-        return f"{self.customer.full_name} - {self.subject}"
-    
-    class Meta:
-        verbose_name = 'Interação com Cliente'
-        verbose_name_plural = 'Interações com Clientes'
-        ordering = ['-created_at']
-
-class Purchase(models.Model):
-    """Customer purchase history"""
-    customer = models.ForeignKey(Customer, on_delete=models.CASCADE, related_name='purchases')
-    product_service = models.CharField(max_length=200, verbose_name='Produto/Serviço')
-    amount = models.DecimalField(max_digits=10, decimal_places=2, verbose_name='Valor')
-    purchase_date = models.DateTimeField(default=timezone.now, verbose_name='Data da Compra')
-    description = models.TextField(blank=True, verbose_name='Descrição')
-    
-    def __str__(self):
-        return f"{self.customer.full_name} - {self.product_service}"
-    
-    def save(self, *args, **kwargs):
-        super().save(*args, **kwargs)
-        # Update customer total revenue
-        self.customer.total_revenue = self.customer.purchases.aggregate(
-            total=models.Sum('amount')
-        )['total'] or 0
-        self.customer.save()
+        return self.send_sms_reminders([appointment])
     
-    class Meta:
-        verbose_name = 'Compra'
-        verbose_name_plural = 'Compras'
-        ordering = ['-purchase_date']
+    def send_sms_reminders(self, appointments):
+        """Send SMS reminders concurrently over the shared Twilio client"""
+        return send_sms_batch([
+            (appointment, sms_reminder_body(appointment)) for appointment in appointments
+        ])
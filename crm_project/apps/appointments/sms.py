@@ -0,0 +1,91 @@
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.core.cache import cache
+from django.utils import timezone
+
+from .models import SmsDelivery
+
+# Concurrent requests to Twilio per batch
+SMS_MAX_WORKERS = 8
+
+# Minimum seconds between two SMS to the same number
+SMS_PER_NUMBER_INTERVAL = 60
+
+_client = None
+_client_lock = threading.Lock()
+
+def get_twilio_client():
+    """Long-lived Twilio client whose HTTP session keeps pooled connections"""
+    global _client
+    if _client is None:
+        from twilio.http.http_client import TwilioHttpClient
+        from twilio.rest import Client
+        
+        with _client_lock:
+            if _client is None:
+                _client = Client(
+                    settings.TWILIO_ACCOUNT_SID,
+                    settings.TWILIO_AUTH_TOKEN,
+                    http_client=TwilioHttpClient(pool_connections=True, timeout=30),
+                )
+    return _client
+
+def sms_reminder_body(appointment):
+    start = timezone.localtime(appointment.start_datetime)
+    message_body = f"""
+        Lembrete: Você tem um agendamento marcado para {start.strftime('%d/%m/%Y às %H:%M')}.
+        
+        {appointment.title}
+        Local: {appointment.location or 'A definir'}
+        
+        Para reagendar ou cancelar, entre em contato conosco.
+        """
+    return message_body.strip()
+
+def acquire_number_slot(number):
+    """Per-number rate limit shared by every process through the cache"""
+    return cache.add(f'sms:rate:{number}', True, timeout=SMS_PER_NUMBER_INTERVAL)
+
+def deliver(number, body):
+    """Send one SMS, returns (status, sid, error); runs in worker threads, so no DB access"""
+    try:
+        message = get_twilio_client().messages.create(
+            body=body,
+            from_=settings.TWILIO_PHONE_NUMBER,
+            to=number
+        )
+    except Exception as e:
+        return 'failed', '', str(e)
+    return 'sent', message.sid, ''
+
+def send_sms_batch(items):
+    """Send (appointment, body) pairs concurrently and record every result.
+    
+    Returns the SmsDelivery rows, created with one bulk insert.
+    """
+    if not settings.TWILIO_ACCOUNT_SID:
+        return []
+    
+    deliveries = []
+    to_send = []
+    for appointment, body in items:
+        number = appointment.customer.phone
+        if not number:
+            continue
+        if not acquire_number_slot(number):
+            deliveries.append(SmsDelivery(appointment=appointment, to_number=number, status='rate_limited'))
+            continue
+        to_send.append((appointment, number, body))
+    
+    if to_send:
+        with ThreadPoolExecutor(max_workers=SMS_MAX_WORKERS) as executor:
+            results = executor.map(lambda item: deliver(item[1], item[2]), to_send)
+            for (appointment, number, _), (status, sid, error) in zip(to_send, results):
+                deliveries.append(SmsDelivery(
+                    appointment=appointment, to_number=number,
+                    status=status, twilio_sid=sid, error=error,
+                ))
+    
+    return SmsDelivery.objects.bulk_create(deliveries)
@@ -0,0 +1,48 @@
+import logging
+
+from celery import shared_task
+
+from .calendar_sync import process_due_operations, pull_remote_changes
+from .email_outbox import send_due_emails
+from .reminders import send_due_reminders
+from .models import CalendarCredential
+
+logger = logging.getLogger(__name__)
+
+@shared_task
+def process_calendar_outbox():
+    """Drain due calendar operations in batches"""
+    processed = 0
+    while True:
+        handled = process_due_operations()
+        processed += handled
+        if not handled:
+            break
+    return processed
+
+@shared_task
+def pull_calendar_changes():
+    """Incrementally pull edits made directly in Google/Outlook calendars"""
+    changed = 0
+    for credential in CalendarCredential.objects.select_related('user').iterator():
+        try:
+            changed += pull_remote_changes(credential)
+        except Exception:
+            logger.exception("Error pulling calendar changes for %s", credential)
+    return changed
+
+@shared_task
+def send_email_outbox():
+    """Send due appointment emails, reusing one SMTP connection per batch"""
+    sent = 0
+    while True:
+        handled = send_due_emails()
+        sent += handled
+        if not handled:
+            break
+    return sent
+
+@shared_task
+def send_appointment_reminders():
+    """Send email/SMS reminders for appointments in the reminder window"""
+    return send_due_reminders()
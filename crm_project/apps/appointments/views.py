@@ -2,24 +2,35 @@ from django.shortcuts import render, get_object_or_404, redirect
 from django.contrib.auth.decorators import login_required
 from django.contrib.auth.mixins import LoginRequiredMixin
 from django.contrib import messages
-from django.db.models import Q, Count
+from django.db.models import Q, Sum
 from django.http import JsonResponse, HttpResponse
+from django.views.decorators.cache import cache_control
+from django.views.decorators.http import condition
 from django.views.generic import ListView, DetailView, CreateView, UpdateView, DeleteView
 from django.urls import reverse_lazy
 from django.utils import timezone
 from datetime import datetime, timedelta, time
 import json
 
-from .models import Appointment, AppointmentType, AppointmentNote, AvailabilitySlot
+from .models import Appointment, AppointmentType, AppointmentNote, AvailabilitySlot, AppointmentDailyStat
 from .forms import AppointmentForm, AppointmentNoteForm, AvailabilitySlotForm
 from apps.customers.models import Customer
-from .services import CalendarService, NotificationService
+from apps.pagination import KeysetPaginationMixin
+from .calendar_sync import enqueue_calendar_sync
+from .email_outbox import enqueue_appointment_email
+from .calendar_feed import feed_etag, feed_last_modified, get_calendar_feed
+from .dates import day_range, filter_day_range, parse_day
+from .availability import (
+    DEFAULT_SLOT_LENGTH, MAX_SEARCH_DAYS, MAX_SEARCH_USERS,
+    availability_windows, busy_intervals, free_slots, search_availability
+)
 
-class AppointmentListView(LoginRequiredMixin, ListView):
+class AppointmentListView(KeysetPaginationMixin, LoginRequiredMixin, ListView):
     model = Appointment
     template_name = 'appointments/appointment_list.html'
     context_object_name = 'appointments'
     paginate_by = 20
+    keyset_fields = ('start_datetime', 'id')
     
     def get_queryset(self):
         queryset = Appointment.objects.select_related(
@@ -30,10 +41,10 @@ class AppointmentListView(LoginRequiredMixin, ListView):
         date_from = self.request.GET.get('date_from')
         date_to = self.request.GET.get('date_to')
         
-        if date_from:
-            queryset = queryset.filter(start_datetime__date__gte=date_from)
-        if date_to:
-            queryset = queryset.filter(start_datetime__date__lte=date_to)
+        try:
+            queryset = filter_day_range(queryset, date_from, date_to)
+        except ValueError:
+            pass
         
         # Filter by status
         status = self.request.GET.get('status')
@@ -101,13 +112,11 @@ class AppointmentCreateView(LoginRequiredMixin, CreateView):
         form.instance.created_by = self.request.user
         response = super().form_valid(form)
         
-        # Create calendar event
-        calendar_service = CalendarService()
-        calendar_service.create_appointment_event(self.object)
+        # Create calendar event (synced in the background after commit)
+        enqueue_calendar_sync(self.object, 'create')
         
-        # Send confirmation
-        notification_service = NotificationService()
-        notification_service.send_appointment_confirmation(self.object)
+        # Send confirmation (queued, sent by the email worker after commit)
+        enqueue_appointment_email(self.object, 'confirmation')
         
         messages.success(self.request, 'Agendamento criado com sucesso!')
         return response
@@ -125,9 +134,8 @@ class AppointmentUpdateView(LoginRequiredMixin, UpdateView):
     def form_valid(self, form):
         response = super().form_valid(form)
         
-        # Update calendar event
-        calendar_service = CalendarService()
-        calendar_service.update_appointment_event(self.object)
+        # Update calendar event (synced in the background after commit)
+        enqueue_calendar_sync(self.object, 'update')
         
         messages.success(self.request, 'Agendamento atualizado com sucesso!')
         return response
@@ -144,13 +152,11 @@ def cancel_appointment(request, pk):
         appointment.status = 'cancelled'
         appointment.save()
         
-        # Cancel calendar event
-        calendar_service = CalendarService()
-        calendar_service.cancel_appointment_event(appointment)
+        # Cancel calendar event (synced in the background after commit)
+        enqueue_calendar_sync(appointment, 'cancel')
         
-        # Send cancellation notification
-        notification_service = NotificationService()
-        notification_service.send_appointment_cancellation(appointment)
+        # Send cancellation notification (queued, sent by the email worker after commit)
+        enqueue_appointment_email(appointment, 'cancellation')
         
         messages.success(request, 'Agendamento cancelado com sucesso!')
         return redirect('appointments:list')
@@ -175,40 +181,27 @@ def add_appointment_note(request, pk):
     
     return redirect('appointments:detail', pk=pk)
 
+def calendar_feed_etag(request):
+    return feed_etag(request.user, request.GET.get('start'), request.GET.get('end'))
+
+def calendar_feed_last_modified(request):
+    return feed_last_modified()
+
 @login_required
+@cache_control(private=True, no_cache=True)
+@condition(etag_func=calendar_feed_etag, last_modified_func=calendar_feed_last_modified)
 def appointment_calendar_data(request):
-    """API endpoint for calendar data"""
+    """API endpoint for calendar data, answers 304 while no appointment changed"""
     start_date = request.GET.get('start')
     end_date = request.GET.get('end')
     
-    appointments = Appointment.objects.filter(
-        start_datetime__date__gte=start_date,
-        start_datetime__date__lte=end_date
-    ).select_related('customer', 'appointment_type', 'assigned_to')
+    if not start_date or not end_date:
+        return JsonResponse({'error': 'start and end are required'}, status=400)
     
-    events = []
-    for appointment in appointments:
-        color = appointment.appointment_type.color
-        if appointment.status == 'cancelled':
-            color = '#dc3545'  # Red for cancelled
-        elif appointment.status == 'completed':
-            color = '#28a745'  # Green for completed
-        
-        events.append({
-            'id': str(appointment.id),
-            'title': f"{appointment.title} - {appointment.customer.full_name}",
-            'start': appointment.start_datetime.isoformat(),
-            'end': appointment.end_datetime.isoformat(),
-            'backgroundColor': color,
-            'borderColor': color,
-            'url': appointment.get_absolute_url(),
-            'extendedProps': {
-                'customer': appointment.customer.full_name,
-                'status': appointment.get_status_display(),
-                'assigned_to': appointment.assigned_to.get_full_name(),
-                'description': appointment.description,
-            }
-        })
+    try:
+        events = get_calendar_feed(request.user, start_date, end_date)
+    except ValueError:
+        return JsonResponse({'error': 'Invalid date format'}, status=400)
     
     return JsonResponse(events, safe=False)
 
@@ -217,106 +210,129 @@ def available_slots(request):
     """API endpoint for available time slots"""
     date = request.GET.get('date')
     user_id = request.GET.get('user_id')
+    appointment_type_id = request.GET.get('appointment_type_id')
     
     if not date or not user_id:
         return JsonResponse({'error': 'Date and user_id are required'}, status=400)
     
     try:
         selected_date = datetime.strptime(date, '%Y-%m-%d').date()
-        weekday = selected_date.weekday()
-        
-        # Get availability slots for the user and weekday
-        availability_slots = AvailabilitySlot.objects.filter(
-            user_id=user_id,
-            weekday=weekday,
-            is_active=True
-        )
-        
-        # Get existing appointments for that date and user
-        existing_appointments = Appointment.objects.filter(
-            assigned_to_id=user_id,
-            start_datetime__date=selected_date,
-            status__in=['scheduled', 'confirmed']
-        )
-        
-        available_slots = []
-        for slot in availability_slots:
-            current_time = datetime.combine(selected_date, slot.start_time)
-            end_time = datetime.combine(selected_date, slot.end_time)
-            
-            while current_time < end_time:
-                slot_end = current_time + timedelta(hours=1)  # 1-hour slots
-                
-                # Check if this slot conflicts with existing appointments
-                conflict = existing_appointments.filter(
-                    start_datetime__lt=slot_end,
-                    end_datetime__gt=current_time
-                ).exists()
-                
-                if not conflict:
-                    available_slots.append({
-                        'start': current_time.strftime('%H:%M'),
-                        'end': slot_end.strftime('%H:%M'),
-                        'datetime': current_time.isoformat()
-                    })
-                
-                current_time = slot_end
-        
-        return JsonResponse({'slots': available_slots})
-        
+        user_id = int(user_id)
     except ValueError:
         return JsonResponse({'error': 'Invalid date format'}, status=400)
+    
+    # Slot length follows the appointment type duration (1 hour by default)
+    slot_length = DEFAULT_SLOT_LENGTH
+    if appointment_type_id:
+        appointment_type = get_object_or_404(AppointmentType, pk=appointment_type_id)
+        slot_length = appointment_type.duration
+    if slot_length <= timedelta(0):
+        return JsonResponse({'error': 'Appointment type duration must be positive'}, status=400)
+    
+    # Get availability slots for the user and weekday
+    availability_slots = AvailabilitySlot.objects.filter(
+        user_id=user_id,
+        weekday=selected_date.weekday(),
+        is_active=True
+    )
+    windows = availability_windows(availability_slots, selected_date)
+    
+    # Get existing appointments for that date and user (single query)
+    day_start, day_end = day_range(selected_date, selected_date)
+    busy = busy_intervals([user_id], day_start, day_end)[user_id]
+    
+    available_slots = []
+    for slot_start, slot_end in free_slots(windows, busy, slot_length):
+        available_slots.append({
+            'start': slot_start.strftime('%H:%M'),
+            'end': slot_end.strftime('%H:%M'),
+            'datetime': slot_start.isoformat()
+        })
+    
+    return JsonResponse({'slots': available_slots})
+
+@login_required
+def first_available_slots(request):
+    """API endpoint for the earliest free slots across several users and days"""
+    try:
+        appointment_type = get_object_or_404(AppointmentType, pk=int(request.GET.get('appointment_type_id', '')))
+        user_ids = [int(pk) for pk in request.GET.get('user_ids', '').split(',') if pk]
+        date_from = parse_day(request.GET['date_from']) if request.GET.get('date_from') else timezone.localdate()
+        date_to = parse_day(request.GET['date_to']) if request.GET.get('date_to') else date_from + timedelta(days=13)
+        limit = min(int(request.GET.get('limit', 20)), 100)
+    except ValueError:
+        return JsonResponse({'error': 'Invalid parameters'}, status=400)
+    
+    if not user_ids:
+        return JsonResponse({'error': 'user_ids is required'}, status=400)
+    if len(user_ids) > MAX_SEARCH_USERS:
+        return JsonResponse({'error': f'At most {MAX_SEARCH_USERS} users per search'}, status=400)
+    if date_to < date_from or (date_to - date_from).days >= MAX_SEARCH_DAYS:
+        return JsonResponse({'error': f'Date range must cover 1 to {MAX_SEARCH_DAYS} days'}, status=400)
+    if appointment_type.duration <= timedelta(0):
+        return JsonResponse({'error': 'Appointment type duration must be positive'}, status=400)
+    
+    candidates = search_availability(user_ids, date_from, date_to, appointment_type.duration, limit)
+    
+    return JsonResponse({
+        'slots': [
+            {
+                'user_id': user.pk,
+                'user': user.get_full_name() or user.username,
+                'start': start.isoformat(),
+                'end': end.isoformat(),
+            }
+            for start, end, user in candidates
+        ]
+    })
 
 @login_required
 def appointment_stats(request):
-    """API endpoint for appointment statistics"""
-    today = timezone.now().date()
+    """API endpoint for appointment statistics, read from the daily rollup"""
+    today = timezone.localdate()
     this_week_start = today - timedelta(days=today.weekday())
     this_month_start = today.replace(day=1)
     
+    rows = AppointmentDailyStat.objects.filter(
+        day__gte=min(this_week_start, this_month_start)
+    ).values('day', 'status').annotate(total=Sum('count'))
+    
+    today_counts = {}
+    week_total = 0
+    month_by_status = {}
+    for row in rows:
+        if row['day'] == today:
+            today_counts[row['status']] = today_counts.get(row['status'], 0) + row['total']
+        if this_week_start <= row['day'] <= today:
+            week_total += row['total']
+        if row['day'] >= this_month_start:
+            month_by_status[row['status']] = month_by_status.get(row['status'], 0) + row['total']
+    
     stats = {
         'today': {
-            'total': Appointment.objects.filter(start_datetime__date=today).count(),
-            'completed': Appointment.objects.filter(
-                start_datetime__date=today, 
-                status='completed'
-            ).count(),
-            'cancelled': Appointment.objects.filter(
-                start_datetime__date=today, 
-                status='cancelled'
-            ).count(),
+            'total': sum(today_counts.values()),
+            'completed': today_counts.get('completed', 0),
+            'cancelled': today_counts.get('cancelled', 0),
         },
         'this_week': {
-            'total': Appointment.objects.filter(
-                start_datetime__date__gte=this_week_start,
-                start_datetime__date__lte=today
-            ).count(),
+            'total': week_total,
         },
         'this_month': {
-            'total': Appointment.objects.filter(
-                start_datetime__date__gte=this_month_start
-            ).count(),
+            'total': sum(month_by_status.values()),
         },
-        'by_status': list(
-            Appointment.objects.filter(
-                start_datetime__date__gte=this_month_start
-            ).values('status').annotate(count=Count('id'))
-        ),
-        'no_show_rate': 0,  # Calculate based on your business logic
+        'by_status': [
+            {'status': status, 'count': count}
+            for status, count in month_by_status.items() if count
+        ],
+        'no_show_rate': 0,
     }
     
-    # Calculate no-show rate
-    total_past = Appointment.objects.filter(
-        end_datetime__lt=timezone.now()
-    ).count()
-    
-    no_shows = Appointment.objects.filter(
-        end_datetime__lt=timezone.now(),
-        status='no_show'
-    ).count()
-    
-    if total_past > 0:
-        stats['no_show_rate'] = round((no_shows / total_past) * 100, 2)
+    # No-show rate over all days before today
+    past = AppointmentDailyStat.objects.filter(day__lt=today).aggregate(
+        total=Sum('count'),
+        no_shows=Sum('count', filter=Q(status='no_show')),
+    )
+    if past['total']:
+        stats['no_show_rate'] = round(((past['no_shows'] or 0) / past['total']) * 100, 2)
     
     return JsonResponse(stats)
-
@@ -0,0 +1,74 @@
+from django.db import models
+from django.db.models import Count, Max, Min, OuterRef, Q, Subquery, Value
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+from .models import Customer, CustomerInteraction, Purchase, revenue_subquery
+
+# Appointment statuses that count as "next appointment"
+UPCOMING_STATUSES = ('scheduled', 'confirmed')
+
+ACTIVITY_FIELDS = ['last_interaction_at', 'purchase_count', 'next_appointment_at', 'total_revenue']
+
+def purchase_count_subquery():
+    counts = Purchase.objects.filter(customer=OuterRef('pk')).order_by().values(
+        'customer'
+    ).annotate(total=Count('pk')).values('total')
+    return Coalesce(Subquery(counts), Value(0), output_field=models.PositiveIntegerField())
+
+def last_interaction_subquery():
+    latest = CustomerInteraction.objects.filter(customer=OuterRef('pk')).order_by().values(
+        'customer'
+    ).annotate(latest=Max('created_at')).values('latest')
+    return Subquery(latest, output_field=models.DateTimeField())
+
+def next_appointment_subquery(now=None):
+    from apps.appointments.models import Appointment
+    
+    upcoming = Appointment.objects.filter(
+        customer=OuterRef('pk'),
+        start_datetime__gte=now or timezone.now(),
+        status__in=UPCOMING_STATUSES,
+    ).order_by().values('customer').annotate(first=Min('start_datetime')).values('first')
+    return Subquery(upcoming, output_field=models.DateTimeField())
+
+def activity_expressions(fields=None):
+    expressions = {
+        'last_interaction_at': last_interaction_subquery,
+        'purchase_count': purchase_count_subquery,
+        'next_appointment_at': next_appointment_subquery,
+        'total_revenue': revenue_subquery,
+    }
+    return {field: expressions[field]() for field in (fields or ACTIVITY_FIELDS)}
+
+def refresh_customer_activity(customer_ids=None, fields=None):
+    """Recompute the denormalized activity columns with a single UPDATE, returns rows touched"""
+    customers = Customer.objects.all()
+    if customer_ids is not None:
+        customers = customers.filter(pk__in=customer_ids)
+    return customers.update(**activity_expressions(fields))
+
+def rebuild_customer_activity(batch_size=2000):
+    """Recompute every customer in primary key batches, so no UPDATE locks the whole table"""
+    updated = 0
+    last_pk = None
+    while True:
+        batch = Customer.objects.order_by('pk')
+        if last_pk is not None:
+            batch = batch.filter(pk__gt=last_pk)
+        ids = list(batch.values_list('pk', flat=True)[:batch_size])
+        if not ids:
+            return updated
+        updated += refresh_customer_activity(ids)
+        last_pk = ids[-1]
+
+def refresh_passed_next_appointments():
+    """Move next_appointment_at forward for customers whose next appointment has started"""
+    stale = Customer.objects.filter(next_appointment_at__lt=timezone.now())
+    return stale.update(next_appointment_at=next_appointment_subquery())
+
+def record_interaction(customer_id, created_at):
+    """Move last_interaction_at forward without reading the customer"""
+    Customer.objects.filter(pk=customer_id).filter(
+        Q(last_interaction_at__isnull=True) | Q(last_interaction_at__lt=created_at)
+    ).update(last_interaction_at=created_at)
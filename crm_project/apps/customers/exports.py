@@ -0,0 +1,66 @@
+import csv
+
+from django.db.models import Count, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+from .models import Customer, CustomerInteraction
+
+EXPORT_HEADER = [
+    'Nome', 'Email', 'Telefone', 'Empresa', 'Segmento',
+    'Status', 'Receita Total', 'Data de Criação'
+]
+
+# Columns fetched for the export, in the order consumed by export_row()
+EXPORT_FIELDS = [
+    'first_name', 'last_name', 'email', 'phone', 'company',
+    'segment__name', 'status', 'total_revenue', 'created_at'
+]
+
+# Extra columns appended by background exports (purchase_count is a stored column,
+# interaction_count comes from with_activity_counts)
+ACTIVITY_HEADER = ['Total de Compras', 'Total de Interações']
+ACTIVITY_FIELDS = ['purchase_count', 'interaction_count']
+
+STATUS_LABELS = dict(Customer.STATUS_CHOICES)
+
+class Echo:
+    """File-like object that hands back what is written, for streaming csv.writer output"""
+    
+    def write(self, value):
+        return value
+
+def export_row(values):
+    first_name, last_name, email, phone, company, segment, status, revenue, created_at = values[:9]
+    return [
+        f"{first_name} {last_name}",
+        email,
+        phone,
+        company,
+        segment or '',
+        STATUS_LABELS.get(status, status),
+        revenue,
+        created_at.strftime('%d/%m/%Y'),
+    ] + list(values[9:])
+
+def count_subquery(model):
+    counts = model.objects.filter(customer=OuterRef('pk')).order_by().values(
+        'customer'
+    ).annotate(total=Count('pk')).values('total')
+    return Coalesce(Subquery(counts), 0)
+
+def with_activity_counts(queryset):
+    """Annotate the interaction count (purchase_count is kept on Customer itself)"""
+    return queryset.annotate(interaction_count=count_subquery(CustomerInteraction))
+
+def iter_export_rows(queryset, chunk_size=2000, extra_fields=()):
+    """Yield export rows using a values_list projection and a server-side cursor"""
+    rows = queryset.values_list(*EXPORT_FIELDS, *extra_fields).iterator(chunk_size=chunk_size)
+    for values in rows:
+        yield export_row(values)
+
+def iter_csv_lines(queryset, chunk_size=2000):
+    """Yield encoded CSV lines (header first) without buffering the whole file"""
+    writer = csv.writer(Echo())
+    yield writer.writerow(EXPORT_HEADER)
+    for row in iter_export_rows(queryset, chunk_size=chunk_size):
+        yield writer.writerow(row)
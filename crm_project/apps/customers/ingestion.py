@@ -0,0 +1,154 @@
+import time
+from decimal import Decimal
+
+from django.db import transaction
+from django.db.models.functions import Lower
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from .activity import refresh_customer_activity
+from .models import Customer, Purchase
+from .search import (
+    SEARCH_FIELDS, build_search_document, search_vector_expression, uses_full_text_search
+)
+from .stats import invalidate_customer_stats
+
+def parse_purchase_date(value):
+    if not value:
+        return timezone.now()
+    parsed = parse_datetime(value)
+    if parsed is None:
+        raise ValueError(f'Data inválida: {value}')
+    if timezone.is_naive(parsed):
+        parsed = timezone.make_aware(parsed)
+    return parsed
+
+def build_purchases(rows, customer_ids):
+    """Turn raw rows into unsaved Purchase objects, returns (purchases, skipped)"""
+    purchases = []
+    skipped = 0
+    for row in rows:
+        customer_id = customer_ids.get((row.get('customer_email') or '').strip().lower())
+        if customer_id is None:
+            skipped += 1
+            continue
+        purchases.append(Purchase(
+            customer_id=customer_id,
+            product_service=row['product_service'],
+            amount=Decimal(str(row['amount'])),
+            purchase_date=parse_purchase_date(row.get('purchase_date')),
+            description=row.get('description', ''),
+        ))
+    return purchases, skipped
+
+def ingest_purchases(rows, batch_size=1000):
+    """Bulk import purchases in one transaction.
+    
+    Each row is a dict with customer_email, product_service, amount and
+    optionally purchase_date and description. Purchase.save is bypassed, so
+    total_revenue and purchase_count are recomputed once per affected
+    customer at the end.
+    """
+    started = time.monotonic()
+    created = 0
+    skipped = 0
+    affected = set()
+    
+    with transaction.atomic():
+        for start in range(0, len(rows), batch_size):
+            batch = rows[start:start + batch_size]
+            emails = {(row.get('customer_email') or '').strip().lower() for row in batch}
+            # Stored emails keep the case they were typed in, so match on Lower(email)
+            customer_ids = {
+                email: pk
+                for email, pk in Customer.objects.annotate(email_lower=Lower('email')).filter(
+                    email_lower__in=emails
+                ).values_list('email_lower', 'pk')
+            }
+            
+            purchases, batch_skipped = build_purchases(batch, customer_ids)
+            Purchase.objects.bulk_create(purchases, batch_size=batch_size)
+            
+            created += len(purchases)
+            skipped += batch_skipped
+            affected.update(purchase.customer_id for purchase in purchases)
+        
+        if affected:
+            refresh_customer_activity(affected, ['purchase_count', 'total_revenue'])
+    
+    elapsed = time.monotonic() - started
+    return {
+        'created': created,
+        'skipped': skipped,
+        'customers': len(affected),
+        'seconds': round(elapsed, 3),
+        'rows_per_second': round(created / elapsed, 1) if elapsed else created,
+    }
+
+def existing_customer_emails(emails):
+    """The subset of emails that already belong to a customer, in one query"""
+    return set(Customer.objects.filter(email__in=set(emails)).values_list('email', flat=True))
+
+def upsert_customers(records, existing=None, created_by=None, batch_size=1000):
+    """Insert or update customers keyed on email with INSERT ... ON CONFLICT.
+    
+    records are validated dicts of Customer field values (segment as
+    segment_id), at most one per email. Fields missing from a record keep
+    their stored value on update; records are grouped by the fields they
+    carry so each group is one bulk_create. Customer.save is bypassed, so the
+    search document and vector are refreshed here. Returns {email: (pk, created)}.
+    """
+    if existing is None:
+        existing = existing_customer_emails(record['email'] for record in records)
+    
+    groups = {}
+    for record in records:
+        groups.setdefault(frozenset(record), []).append(record)
+    
+    written = []
+    stale_search = []
+    with transaction.atomic():
+        for keys, group in groups.items():
+            has_search_fields = set(SEARCH_FIELDS) <= keys
+            update_fields = sorted(keys - {'email'}) + ['updated_at']
+            if has_search_fields:
+                update_fields.append('search_document')
+            
+            customers = []
+            for record in group:
+                customer = Customer(created_by=created_by, **record)
+                if has_search_fields:
+                    customer.search_document = build_search_document(customer)
+                else:
+                    stale_search.append(customer.email)
+                customers.append(customer)
+            
+            Customer.objects.bulk_create(
+                customers, batch_size=batch_size,
+                update_conflicts=True, unique_fields=['email'], update_fields=update_fields,
+            )
+            written.extend(customer.email for customer in customers)
+        
+        # The uuid4 default is never replaced by the stored id of an updated row,
+        # so the real primary keys are read back once for the whole request
+        ids = dict(Customer.objects.filter(email__in=written).values_list('email', 'pk'))
+        results = {email: (ids[email], email not in existing) for email in written}
+        
+        if stale_search:
+            # Partial records: the document needs the stored values of the other fields
+            customers = list(Customer.objects.filter(email__in=stale_search).only('pk', *SEARCH_FIELDS))
+            for customer in customers:
+                customer.search_document = build_search_document(customer)
+            Customer.objects.bulk_update(customers, ['search_document'], batch_size=batch_size)
+        
+        if results and uses_full_text_search():
+            Customer.objects.filter(pk__in=ids.values()).update(
+                search_vector=search_vector_expression()
+            )
+    
+    if results:
+        # No post_save was sent, so clear what the Customer receivers would have
+        from apps.appointments.calendar_feed import bump_feed_version
+        invalidate_customer_stats()
+        bump_feed_version()
+    return results
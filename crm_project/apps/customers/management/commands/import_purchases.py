@@ -0,0 +1,33 @@
+import csv
+
+from django.core.management.base import BaseCommand, CommandError
+
+from apps.customers.ingestion import ingest_purchases
+
+class Command(BaseCommand):
+    help = (
+        'Bulk import purchases from a CSV with customer_email, product_service, '
+        'amount, purchase_date and description columns'
+    )
+    
+    def add_arguments(self, parser):
+        parser.add_argument('csv_file')
+        parser.add_argument('--batch-size', type=int, default=1000)
+    
+    def handle(self, *args, **options):
+        try:
+            with open(options['csv_file'], newline='', encoding='utf-8') as handle:
+                rows = list(csv.DictReader(handle))
+        except OSError as e:
+            raise CommandError(f'Não foi possível ler o arquivo: {e}')
+        
+        try:
+            stats = ingest_purchases(rows, batch_size=options['batch_size'])
+        except (KeyError, ValueError, ArithmeticError) as e:
+            raise CommandError(f'Erro na importação, nenhuma compra foi salva: {e}')
+        
+        self.stdout.write(self.style.SUCCESS(
+            f"{stats['created']} compras importadas para {stats['customers']} clientes "
+            f"em {stats['seconds']}s ({stats['rows_per_second']} linhas/s). "
+            f"{stats['skipped']} linhas ignoradas (cliente não encontrado)."
+        ))
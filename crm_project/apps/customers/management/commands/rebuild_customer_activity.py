@@ -0,0 +1,13 @@
+from django.core.management.base import BaseCommand
+
+from apps.customers.activity import rebuild_customer_activity
+
+class Command(BaseCommand):
+    help = 'Recompute last interaction, purchase count, next appointment and revenue for every customer'
+    
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=2000)
+    
+    def handle(self, *args, **options):
+        updated = rebuild_customer_activity(batch_size=options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(f'Resumo de atividade atualizado para {updated} clientes.'))
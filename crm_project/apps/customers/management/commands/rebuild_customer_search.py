@@ -0,0 +1,35 @@
+from django.core.management.base import BaseCommand
+
+from apps.customers.models import Customer
+from apps.customers.search import (
+    SEARCH_FIELDS, build_search_document, search_vector_expression, uses_full_text_search
+)
+
+class Command(BaseCommand):
+    help = 'Rebuild the customer search document and search vector in batches'
+    
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=2000)
+    
+    def handle(self, *args, **options):
+        batch_size = options['batch_size']
+        customers = Customer.objects.only('pk', *SEARCH_FIELDS).order_by('pk')
+        
+        batch = []
+        updated = 0
+        for customer in customers.iterator(chunk_size=batch_size):
+            customer.search_document = build_search_document(customer)
+            batch.append(customer)
+            if len(batch) >= batch_size:
+                Customer.objects.bulk_update(batch, ['search_document'])
+                updated += len(batch)
+                batch = []
+        
+        if batch:
+            Customer.objects.bulk_update(batch, ['search_document'])
+            updated += len(batch)
+        
+        if uses_full_text_search():
+            Customer.objects.update(search_vector=search_vector_expression())
+        
+        self.stdout.write(self.style.SUCCESS(f'Índice de busca atualizado para {updated} clientes.'))
@@ -0,0 +1,24 @@
+from django.core.management.base import BaseCommand
+from django.db.models import F
+
+from apps.customers.models import Customer, recompute_customer_revenue, revenue_subquery
+
+class Command(BaseCommand):
+    help = 'Fix drift between Customer.total_revenue and the sum of their purchases'
+    
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--dry-run', action='store_true',
+            help='Only report how many customers have drifted'
+        )
+    
+    def handle(self, *args, **options):
+        if options['dry_run']:
+            drifted = Customer.objects.annotate(actual_revenue=revenue_subquery()).exclude(
+                total_revenue=F('actual_revenue')
+            ).count()
+            self.stdout.write(f'{drifted} clientes com receita divergente.')
+            return
+        
+        fixed = recompute_customer_revenue()
+        self.stdout.write(self.style.SUCCESS(f'Receita recalculada para {fixed} clientes.'))
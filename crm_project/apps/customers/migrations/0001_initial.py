@@ -0,0 +1,145 @@
+# Generated by Django 5.2.2 on 2026-10-18 04:25
+
+import django.contrib.postgres.search
+import django.db.models.deletion
+import django.db.models.functions.text
+import django.utils.timezone
+import uuid
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CustomerSegment',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=100, unique=True)),
+                ('description', models.TextField(blank=True)),
+                ('color', models.CharField(default='#007bff', max_length=7)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+            ],
+            options={
+                'verbose_name': 'Segmento de Cliente',
+                'verbose_name_plural': 'Segmentos de Clientes',
+            },
+        ),
+        migrations.CreateModel(
+            name='Customer',
+            fields=[
+                ('id', models.UUIDField(default=uuid.uuid4, editable=False, primary_key=True, serialize=False)),
+                ('first_name', models.CharField(max_length=100, verbose_name='Nome')),
+                ('last_name', models.CharField(max_length=100, verbose_name='Sobrenome')),
+                ('email', models.EmailField(max_length=254, unique=True, verbose_name='Email')),
+                ('phone', models.CharField(blank=True, max_length=20, verbose_name='Telefone')),
+                ('address', models.TextField(blank=True, verbose_name='Endereço')),
+                ('city', models.CharField(blank=True, max_length=100, verbose_name='Cidade')),
+                ('state', models.CharField(blank=True, max_length=50, verbose_name='Estado')),
+                ('postal_code', models.CharField(blank=True, max_length=20, verbose_name='CEP')),
+                ('country', models.CharField(default='Brasil', max_length=100, verbose_name='País')),
+                ('company', models.CharField(blank=True, max_length=200, verbose_name='Empresa')),
+                ('position', models.CharField(blank=True, max_length=100, verbose_name='Cargo')),
+                ('status', models.CharField(choices=[('active', 'Ativo'), ('inactive', 'Inativo'), ('prospect', 'Prospect'), ('lost', 'Perdido')], default='prospect', max_length=20)),
+                ('total_revenue', models.DecimalField(decimal_places=2, default=0, max_digits=10)),
+                ('purchase_count', models.PositiveIntegerField(default=0, editable=False)),
+                ('last_interaction_at', models.DateTimeField(blank=True, editable=False, null=True)),
+                ('next_appointment_at', models.DateTimeField(blank=True, editable=False, null=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('notes', models.TextField(blank=True, verbose_name='Observações')),
+                ('search_document', models.TextField(blank=True, editable=False)),
+                ('search_vector', django.contrib.postgres.search.SearchVectorField(editable=False, null=True)),
+                ('created_by', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, to=settings.AUTH_USER_MODEL)),
+                ('segment', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, to='customers.customersegment')),
+            ],
+            options={
+                'verbose_name': 'Cliente',
+                'verbose_name_plural': 'Clientes',
+                'ordering': ['-created_at'],
+            },
+        ),
+        migrations.CreateModel(
+            name='CustomerExport',
+            fields=[
+                ('id', models.UUIDField(default=uuid.uuid4, editable=False, primary_key=True, serialize=False)),
+                ('status', models.CharField(choices=[('pending', 'Pendente'), ('running', 'Em andamento'), ('completed', 'Concluída'), ('failed', 'Falhou')], default='pending', max_length=20)),
+                ('filters', models.JSONField(blank=True, default=dict)),
+                ('chunk_size', models.PositiveIntegerField(default=5000)),
+                ('total_rows', models.PositiveIntegerField(default=0)),
+                ('processed_rows', models.PositiveIntegerField(default=0)),
+                ('completed_chunks', models.PositiveIntegerField(default=0)),
+                ('last_customer_id', models.UUIDField(blank=True, null=True)),
+                ('file_path', models.CharField(blank=True, max_length=255)),
+                ('error', models.TextField(blank=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('finished_at', models.DateTimeField(blank=True, null=True)),
+                ('created_by', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'verbose_name': 'Exportação de Clientes',
+                'verbose_name_plural': 'Exportações de Clientes',
+                'ordering': ['-created_at'],
+            },
+        ),
+        migrations.CreateModel(
+            name='CustomerInteraction',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('interaction_type', models.CharField(choices=[('email', 'Email'), ('phone', 'Telefone'), ('meeting', 'Reunião'), ('note', 'Nota'), ('purchase', 'Compra'), ('support', 'Suporte')], max_length=20)),
+                ('subject', models.CharField(max_length=200)),
+                ('description', models.TextField()),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('created_by', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to=settings.AUTH_USER_MODEL)),
+                ('customer', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='interactions', to='customers.customer')),
+            ],
+            options={
+                'verbose_name': 'Interação com Cliente',
+                'verbose_name_plural': 'Interações com Clientes',
+                'ordering': ['-created_at'],
+            },
+        ),
+        migrations.CreateModel(
+            name='Purchase',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('product_service', models.CharField(max_length=200, verbose_name='Produto/Serviço')),
+                ('amount', models.DecimalField(decimal_places=2, max_digits=10, verbose_name='Valor')),
+                ('purchase_date', models.DateTimeField(default=django.utils.timezone.now, verbose_name='Data da Compra')),
+                ('description', models.TextField(blank=True, verbose_name='Descrição')),
+                ('customer', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='purchases', to='customers.customer')),
+            ],
+            options={
+                'verbose_name': 'Compra',
+                'verbose_name_plural': 'Compras',
+                'ordering': ['-purchase_date'],
+            },
+        ),
+        migrations.AddIndex(
+            model_name='customer',
+            index=models.Index(django.db.models.functions.text.Lower('email'), name='customer_email_lower_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='customer',
+            index=models.Index(fields=['-created_at', '-id'], name='customer_created_id_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='customer',
+            index=models.Index(fields=['next_appointment_at'], name='customer_next_appt_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='customer',
+            index=models.Index(fields=['purchase_count'], name='customer_purchase_count_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='customer',
+            index=models.Index(fields=['total_revenue'], name='customer_total_revenue_idx'),
+        ),
+    ]
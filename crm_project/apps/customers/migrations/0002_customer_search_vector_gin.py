@@ -0,0 +1,28 @@
+from django.db import migrations
+
+INDEX_NAME = 'customer_search_vector_idx'
+
+def create_search_index(apps, schema_editor):
+    # GIN and tsvector only exist on PostgreSQL; SQLite test databases use the
+    # search_document substring fallback instead
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    table = apps.get_model('customers', 'Customer')._meta.db_table
+    schema_editor.execute(
+        f'CREATE INDEX IF NOT EXISTS {INDEX_NAME} ON {schema_editor.quote_name(table)} USING gin (search_vector)'
+    )
+
+def drop_search_index(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    schema_editor.execute(f'DROP INDEX IF EXISTS {INDEX_NAME}')
+
+class Migration(migrations.Migration):
+    
+    dependencies = [
+        ('customers', '0001_initial'),
+    ]
+    
+    operations = [
+        migrations.RunPython(create_search_index, drop_search_index),
+    ]
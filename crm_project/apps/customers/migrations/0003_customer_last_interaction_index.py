@@ -0,0 +1,29 @@
+from django.db import migrations
+
+INDEX_NAME = 'customer_last_interaction_idx'
+
+def create_last_interaction_index(apps, schema_editor):
+    # Matches the "last interaction" sort of the customer list (newest first,
+    # never last). SQLite cannot index NULLS LAST, so the index is PostgreSQL only
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    table = apps.get_model('customers', 'Customer')._meta.db_table
+    schema_editor.execute(
+        f'CREATE INDEX IF NOT EXISTS {INDEX_NAME} ON {schema_editor.quote_name(table)} '
+        f'(last_interaction_at DESC NULLS LAST)'
+    )
+
+def drop_last_interaction_index(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    schema_editor.execute(f'DROP INDEX IF EXISTS {INDEX_NAME}')
+
+class Migration(migrations.Migration):
+    
+    dependencies = [
+        ('customers', '0002_customer_search_vector_gin'),
+    ]
+    
+    operations = [
+        migrations.RunPython(create_last_interaction_index, drop_last_interaction_index),
+    ]
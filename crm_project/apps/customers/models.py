@@ -1,8 +1,18 @@
-from django.db import models
+from django.db import models, transaction
+from django.db.models import F, OuterRef, Subquery, Sum, Value
+from django.db.models.functions import Coalesce, Lower
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
 from django.contrib.auth.models import User
+from django.contrib.postgres.search import SearchVectorField
 from django.urls import reverse
 from django.utils import timezone
 import uuid
+from decimal import Decimal
+
+from .search import (
+    SEARCH_FIELDS, build_search_document, search_vector_expression, uses_full_text_search
+)
 
 class CustomerSegment(models.Model):
     """Customer segmentation categories"""
@@ -50,86 +60,220 @@ class Customer(models.Model):
     # Financial Information
     total_revenue = models.DecimalField(max_digits=10, decimal_places=2, default=0)
     
+    # Activity summary (maintained incrementally, see apps.customers.activity)
+    purchase_count = models.PositiveIntegerField(default=0, editable=False)
+    last_interaction_at = models.DateTimeField(null=True, blank=True, editable=False)
+    next_appointment_at = models.DateTimeField(null=True, blank=True, editable=False)
+    
     # Metadata
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
-    created_by = models.ForeignKey(
-        User, 
-        on_delete=models.SET_NULL, 
-        null=True, 
-        blank=True,
-        related_name='created_appointments'
-    )
+    created_by = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, blank=True)
     
-    # Notes and Follow-up
+    # Additional Information
     notes = models.TextField(blank=True, verbose_name='Observações')
-    follow_up_required = models.BooleanField(default=False, verbose_name='Requer Follow-up')
+    
+    # Search (maintained on save, see apps.customers.search)
+    search_document = models.TextField(blank=True, editable=False)
+    search_vector = SearchVectorField(null=True, editable=False)
     
     def __str__(self):
-        return f"{self.title} - {self.customer.full_name} ({self.start_datetime.strftime('%d/%m/%Y %H:%M')})"
+        return f"{self.first_name} {self.last_name}"
     
-    @property
-    def duration(self):
-        return self.end_datetime - self.start_datetime
+    # Maintained with atomic UPDATEs (F() deltas and activity refreshes), never by save()
+    DENORMALIZED_FIELDS = ['total_revenue', 'purchase_count', 'last_interaction_at', 'next_appointment_at']
     
-    @property
-    def is_past(self):
-        return self.end_datetime < timezone.now()
+    def save(self, *args, **kwargs):
+        update_fields = kwargs.get('update_fields')
+        if update_fields is None and not self._state.adding and not kwargs.get('force_insert'):
+            # A full save would write back stale copies over concurrent updates
+            update_fields = kwargs['update_fields'] = [
+                field.name for field in self._meta.concrete_fields
+                if not field.primary_key and field.name not in self.DENORMALIZED_FIELDS
+            ]
+        refresh_search = update_fields is None or bool(set(update_fields) & set(SEARCH_FIELDS))
+        if refresh_search:
+            self.search_document = build_search_document(self)
+            if update_fields is not None:
+                kwargs['update_fields'] = set(update_fields) | {'search_document'}
+        
+        super().save(*args, **kwargs)
+        
+        if refresh_search and uses_full_text_search():
+            Customer.objects.filter(pk=self.pk).update(search_vector=search_vector_expression())
     
     @property
-    def is_today(self):
-        today = timezone.now().date()
-        return self.start_datetime.date() == today
+    def full_name(self):
+        return f"{self.first_name} {self.last_name}"
     
     def get_absolute_url(self):
-        return reverse('appointments:detail', kwargs={'pk': self.pk})
-    
-    def can_be_cancelled(self):
-        """Check if appointment can still be cancelled"""
-        return self.status in ['scheduled', 'confirmed'] and not self.is_past
+        return reverse('customers:detail', kwargs={'pk': self.pk})
     
     class Meta:
-        verbose_name = 'Agendamento'
-        verbose_name_plural = 'Agendamentos'
-        ordering = ['start_datetime']
+        verbose_name = 'Cliente'
+        verbose_name_plural = 'Clientes'
+        ordering = ['-created_at']
+        indexes = [
+            # Case-insensitive email lookups of the purchase import
+            models.Index(Lower('email'), name='customer_email_lower_idx'),
+            # Keyset pagination of the customer list
+            models.Index(fields=['-created_at', '-id'], name='customer_created_id_idx'),
+            models.Index(fields=['next_appointment_at'], name='customer_next_appt_idx'),
+            models.Index(fields=['purchase_count'], name='customer_purchase_count_idx'),
+            models.Index(fields=['total_revenue'], name='customer_total_revenue_idx'),
+        ]
 
-class AppointmentNote(models.Model):
-    """Notes added to appointments"""
-    appointment = models.ForeignKey('Appointment', on_delete=models.CASCADE, related_name='appointment_notes')
-    note = models.TextField(verbose_name='Nota')
+class CustomerInteraction(models.Model):
+    """Track all customer interactions"""
+    INTERACTION_TYPES = [
+        ('email', 'Email'),
+        ('phone', 'Telefone'),
+        ('meeting', 'Reunião'),
+        ('note', 'Nota'),
+        ('purchase', 'Compra'),
+        ('support', 'Suporte'),
+    ]
+    
+    customer = models.ForeignKey(Customer, on_delete=models.CASCADE, related_name='interactions')
+    interaction_type = models.CharField(max_length=20, choices=INTERACTION_TYPES)
+    subject = models.CharField(max_length=200)
+    description = models.TextField()
     created_at = models.DateTimeField(auto_now_add=True)
     created_by = models.ForeignKey(User, on_delete=models.CASCADE)
     
     def __str__(self):
-        return f"Nota para {self.appointment.title}"
+        return f"{self.customer.full_name} - {self.subject}"
     
     class Meta:
-        verbose_name = 'Nota do Agendamento'
-        verbose_name_plural = 'Notas dos Agendamentos'
+        verbose_name = 'Interação com Cliente'
+        verbose_name_plural = 'Interações com Clientes'
         ordering = ['-created_at']
 
-class AvailabilitySlot(models.Model):
-    """Define available time slots for appointments"""
-    WEEKDAY_CHOICES = [
-        (0, 'Segunda-feira'),
-        (1, 'Terça-feira'),
-        (2, 'Quarta-feira'),
-        (3, 'Quinta-feira'),
-        (4, 'Sexta-feira'),
-        (5, 'Sábado'),
-        (6, 'Domingo'),
+class Purchase(models.Model):
+    """Customer purchase history"""
+    customer = models.ForeignKey(Customer, on_delete=models.CASCADE, related_name='purchases')
+    product_service = models.CharField(max_length=200, verbose_name='Produto/Serviço')
+    amount = models.DecimalField(max_digits=10, decimal_places=2, verbose_name='Valor')
+    purchase_date = models.DateTimeField(default=timezone.now, verbose_name='Data da Compra')
+    description = models.TextField(blank=True, verbose_name='Descrição')
+    
+    def __str__(self):
+        return f"{self.customer.full_name} - {self.product_service}"
+    
+    def save(self, *args, **kwargs):
+        with transaction.atomic():
+            previous = None
+            if self.pk:
+                previous = Purchase.objects.filter(pk=self.pk).values_list(
+                    'customer_id', 'amount'
+                ).first()
+            
+            super().save(*args, **kwargs)
+            
+            # Update customer total revenue (and purchase count) by the difference only
+            if previous is None:
+                adjust_customer_revenue(self.customer_id, self.amount, purchases=1)
+            elif previous[0] != self.customer_id:
+                adjust_customer_revenue(previous[0], -previous[1], purchases=-1)
+                adjust_customer_revenue(self.customer_id, self.amount, purchases=1)
+            elif previous[1] != self.amount:
+                adjust_customer_revenue(self.customer_id, self.amount - previous[1])
+    
+    class Meta:
+        verbose_name = 'Compra'
+        verbose_name_plural = 'Compras'
+        ordering = ['-purchase_date']
+
+@receiver(post_save, sender=Customer)
+@receiver(post_delete, sender=Customer)
+def refresh_customer_stats(sender, **kwargs):
+    from .stats import invalidate_customer_stats
+    invalidate_customer_stats()
+
+@receiver(post_delete, sender=Purchase)
+def subtract_deleted_purchase(sender, instance, **kwargs):
+    """Keep total_revenue and purchase_count in sync for instance, queryset and cascade deletes"""
+    adjust_customer_revenue(instance.customer_id, -instance.amount, purchases=-1)
+
+@receiver(post_save, sender=CustomerInteraction)
+def record_customer_interaction(sender, instance, created, **kwargs):
+    if created:
+        from .activity import record_interaction
+        record_interaction(instance.customer_id, instance.created_at)
+
+@receiver(post_delete, sender=CustomerInteraction)
+def forget_customer_interaction(sender, instance, **kwargs):
+    from .activity import refresh_customer_activity
+    refresh_customer_activity([instance.customer_id], ['last_interaction_at'])
+
+def adjust_customer_revenue(customer_id, delta, purchases=0):
+    """Atomically add delta to a customer's total_revenue (no full save, updated_at untouched)"""
+    changes = {}
+    if delta:
+        changes['total_revenue'] = F('total_revenue') + delta
+    if purchases:
+        changes['purchase_count'] = F('purchase_count') + purchases
+    if changes:
+        Customer.objects.filter(pk=customer_id).update(**changes)
+
+def revenue_subquery():
+    totals = Purchase.objects.filter(customer=OuterRef('pk')).order_by().values(
+        'customer'
+    ).annotate(total=Sum('amount')).values('total')
+    return Coalesce(Subquery(totals), Value(Decimal('0')), output_field=models.DecimalField())
+
+def recompute_customer_revenue(customer_ids=None):
+    """Recompute total_revenue from purchases with a single UPDATE, returns rows fixed"""
+    customers = Customer.objects.all()
+    if customer_ids is not None:
+        customers = customers.filter(pk__in=customer_ids)
+    
+    drifted = customers.annotate(actual_revenue=revenue_subquery()).exclude(
+        total_revenue=F('actual_revenue')
+    )
+    return Customer.objects.filter(pk__in=drifted.values('pk')).update(
+        total_revenue=revenue_subquery()
+    )
+
+class CustomerExport(models.Model):
+    """Background customer export job, written to MEDIA_ROOT in resumable chunks"""
+    STATUS_CHOICES = [
+        ('pending', 'Pendente'),
+        ('running', 'Em andamento'),
+        ('completed', 'Concluída'),
+        ('failed', 'Falhou'),
     ]
     
-    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='availability_slots')
-    weekday = models.IntegerField(choices=WEEKDAY_CHOICES)
-    start_time = models.TimeField(verbose_name='Hora de Início')
-    end_time = models.TimeField(verbose_name='Hora de Fim')
-    is_active = models.BooleanField(default=True, verbose_name='Ativo')
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='pending')
+    filters = models.JSONField(default=dict, blank=True)
+    chunk_size = models.PositiveIntegerField(default=5000)
+    
+    # Progress (updated after each chunk file is written)
+    total_rows = models.PositiveIntegerField(default=0)
+    processed_rows = models.PositiveIntegerField(default=0)
+    completed_chunks = models.PositiveIntegerField(default=0)
+    last_customer_id = models.UUIDField(null=True, blank=True)
+    
+    file_path = models.CharField(max_length=255, blank=True)
+    error = models.TextField(blank=True)
+    
+    created_at = models.DateTimeField(auto_now_add=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+    created_by = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, blank=True)
     
     def __str__(self):
-        return f"{self.user.get_full_name()} - {self.get_weekday_display()} ({self.start_time}-{self.end_time})"
+        return f"Exportação {self.pk} ({self.get_status_display()})"
+    
+    @property
+    def progress(self):
+        if self.status == 'completed':
+            return 100
+        if not self.total_rows:
+            return 0
+        return round(self.processed_rows * 100 / self.total_rows, 1)
     
     class Meta:
-        verbose_name = 'Horário Disponível'
-        verbose_name_plural = 'Horários Disponíveis'
-        unique_together = ['user', 'weekday', 'start_time']
+        verbose_name = 'Exportação de Clientes'
+        verbose_name_plural = 'Exportações de Clientes'
+        ordering = ['-created_at']
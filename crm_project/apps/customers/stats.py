@@ -0,0 +1,71 @@
+from datetime import timedelta
+from decimal import Decimal
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Count, Q, Sum
+from django.utils import timezone
+
+from .models import Customer, CustomerSegment
+
+STATS_CACHE_KEY = 'customers:stats'
+STATS_STALE_CACHE_KEY = 'customers:stats:stale'
+STATS_REFRESH_LOCK_KEY = 'customers:stats:refresh-lock'
+STATS_REFRESH_INTERVAL = getattr(settings, 'CUSTOMER_STATS_REFRESH_INTERVAL', 60)
+
+def compute_customer_stats():
+    """Compute dashboard statistics in one grouped pass over customers"""
+    recent_since = timezone.now() - timedelta(days=30)
+    rows = Customer.objects.order_by().values('segment_id').annotate(
+        total=Count('pk'),
+        active=Count('pk', filter=Q(status='active')),
+        prospects=Count('pk', filter=Q(status='prospect')),
+        revenue=Sum('total_revenue'),
+        recent=Count('pk', filter=Q(created_at__gte=recent_since)),
+    )
+    
+    stats = {
+        'total_customers': 0,
+        'active_customers': 0,
+        'prospects': 0,
+        'total_revenue': Decimal('0'),
+        'recent_customers': 0,
+    }
+    by_segment = {}
+    for row in rows:
+        stats['total_customers'] += row['total']
+        stats['active_customers'] += row['active']
+        stats['prospects'] += row['prospects']
+        stats['total_revenue'] += row['revenue'] or 0
+        stats['recent_customers'] += row['recent']
+        by_segment[row['segment_id']] = row['total']
+    
+    stats['customers_by_segment'] = [
+        {'name': name, 'count': by_segment.get(pk, 0), 'color': color}
+        for pk, name, color in CustomerSegment.objects.values_list('pk', 'name', 'color')
+    ]
+    return stats
+
+def get_customer_stats():
+    """Cached customer statistics.
+    
+    The database is hit at most once per refresh interval: whoever takes the
+    refresh lock recomputes, everyone else is served the last snapshot.
+    """
+    stats = cache.get(STATS_CACHE_KEY)
+    if stats is not None:
+        return stats
+    
+    if not cache.add(STATS_REFRESH_LOCK_KEY, True, timeout=STATS_REFRESH_INTERVAL):
+        stale = cache.get(STATS_STALE_CACHE_KEY)
+        if stale is not None:
+            return stale
+    
+    stats = compute_customer_stats()
+    cache.set(STATS_CACHE_KEY, stats, timeout=STATS_REFRESH_INTERVAL)
+    cache.set(STATS_STALE_CACHE_KEY, stats, timeout=None)
+    return stats
+
+def invalidate_customer_stats():
+    # Releasing the lock lets the next reader recompute instead of serving the stale snapshot
+    cache.delete_many([STATS_CACHE_KEY, STATS_REFRESH_LOCK_KEY])
@@ -0,0 +1,105 @@
+import csv
+import os
+import shutil
+
+from celery import shared_task
+from django.conf import settings
+from django.utils import timezone
+
+from .activity import refresh_passed_next_appointments
+from .exports import (
+    ACTIVITY_FIELDS, ACTIVITY_HEADER, EXPORT_HEADER, iter_export_rows, with_activity_counts
+)
+from .models import Customer, CustomerExport
+from .search import filter_customers
+
+def export_directory(export):
+    return os.path.join(settings.MEDIA_ROOT, 'exports', str(export.pk))
+
+def chunk_path(export, index):
+    return os.path.join(export_directory(export), f'part-{index:05d}.csv')
+
+def export_queryset(export):
+    """Filtered export queryset in primary key order, so chunks can resume by keyset"""
+    queryset = filter_customers(Customer.objects.all(), export.filters)
+    return with_activity_counts(queryset).order_by('pk')
+
+def write_chunk(export, index, rows):
+    """Write one chunk atomically: a crash mid-write leaves no partial part file"""
+    path = chunk_path(export, index)
+    tmp_path = f'{path}.tmp'
+    with open(tmp_path, 'w', newline='', encoding='utf-8') as handle:
+        csv.writer(handle).writerows(rows)
+    os.replace(tmp_path, path)
+
+def assemble_export(export):
+    """Concatenate the chunk files into the final downloadable CSV"""
+    directory = export_directory(export)
+    final_path = os.path.join(directory, 'customers.csv')
+    with open(final_path, 'w', newline='', encoding='utf-8') as output:
+        csv.writer(output).writerow(EXPORT_HEADER + ACTIVITY_HEADER)
+        for index in range(1, export.completed_chunks + 1):
+            with open(chunk_path(export, index), encoding='utf-8') as part:
+                shutil.copyfileobj(part, output)
+    
+    for index in range(1, export.completed_chunks + 1):
+        os.remove(chunk_path(export, index))
+    
+    return os.path.relpath(final_path, settings.MEDIA_ROOT)
+
+@shared_task(acks_late=True, reject_on_worker_lost=True)
+def run_customer_export(export_id):
+    """Build a customer export chunk by chunk, resuming after the last completed chunk"""
+    export = CustomerExport.objects.get(pk=export_id)
+    if export.status == 'completed':
+        return export.file_path
+    
+    os.makedirs(export_directory(export), exist_ok=True)
+    queryset = export_queryset(export)
+    
+    if export.status == 'pending':
+        export.total_rows = queryset.count()
+    export.status = 'running'
+    export.error = ''
+    export.save(update_fields=['status', 'total_rows', 'error'])
+    
+    try:
+        while True:
+            chunk = queryset
+            if export.last_customer_id:
+                chunk = chunk.filter(pk__gt=export.last_customer_id)
+            
+            rows = []
+            last_pk = None
+            for values in iter_export_rows(
+                chunk[:export.chunk_size], extra_fields=[*ACTIVITY_FIELDS, 'pk']
+            ):
+                # pk is projected last only to drive the keyset, it is not exported
+                last_pk = values.pop()
+                rows.append(values)
+            
+            if not rows:
+                break
+            
+            write_chunk(export, export.completed_chunks + 1, rows)
+            export.completed_chunks += 1
+            export.processed_rows += len(rows)
+            export.last_customer_id = last_pk
+            export.save(update_fields=['completed_chunks', 'processed_rows', 'last_customer_id'])
+        
+        export.file_path = assemble_export(export)
+        export.status = 'completed'
+        export.finished_at = timezone.now()
+        export.save(update_fields=['file_path', 'status', 'finished_at'])
+    except Exception as e:
+        export.status = 'failed'
+        export.error = str(e)
+        export.save(update_fields=['status', 'error'])
+        raise
+    
+    return export.file_path
+
+@shared_task
+def refresh_next_appointments():
+    """Advance next_appointment_at for customers whose next appointment has already started"""
+    return refresh_passed_next_appointments()
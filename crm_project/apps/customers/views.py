@@ -2,47 +2,40 @@ from django.shortcuts import render, get_object_or_404, redirect
 from django.contrib.auth.decorators import login_required
 from django.contrib.auth.mixins import LoginRequiredMixin
 from django.contrib import messages
-from django.db.models import Q, Sum, Count
-from django.http import JsonResponse, HttpResponse
+from django.db.models import Prefetch
+from django.http import JsonResponse, StreamingHttpResponse, FileResponse, Http404
 from django.views.generic import ListView, DetailView, CreateView, UpdateView, DeleteView
 from django.urls import reverse_lazy
 from django.core.paginator import Paginator
-import csv
-from datetime import datetime, timedelta
+from django.conf import settings
+import os
+from datetime import datetime
 
-from .models import Customer, CustomerSegment, CustomerInteraction, Purchase
+from apps.pagination import KeysetPaginationMixin
+from .models import Customer, CustomerSegment, CustomerInteraction, Purchase, CustomerExport
 from .forms import CustomerForm, CustomerInteractionForm, PurchaseForm
+from .search import SORT_OPTIONS, filter_customers
+from .exports import iter_csv_lines
+from .tasks import run_customer_export
+from .stats import get_customer_stats
 
-class CustomerListView(LoginRequiredMixin, ListView):
+class CustomerListView(KeysetPaginationMixin, LoginRequiredMixin, ListView):
     model = Customer
     template_name = 'customers/customer_list.html'
     context_object_name = 'customers'
     paginate_by = 20
+    keyset_fields = ('created_at', 'id')
+    keyset_descending = True
+    
+    def use_keyset(self):
+        # Ranked search and activity sorts are not covered by the keyset, they keep page numbers
+        return not self.request.GET.get('search') and self.request.GET.get('sort') not in SORT_OPTIONS
     
     def get_queryset(self):
         queryset = Customer.objects.select_related('segment', 'created_by')
         
-        # Search functionality
-        search = self.request.GET.get('search')
-        if search:
-            queryset = queryset.filter(
-                Q(first_name__icontains=search) |
-                Q(last_name__icontains=search) |
-                Q(email__icontains=search) |
-                Q(company__icontains=search)
-            )
-        
-        # Filter by segment
-        segment = self.request.GET.get('segment')
-        if segment:
-            queryset = queryset.filter(segment_id=segment)
-        
-        # Filter by status
-        status = self.request.GET.get('status')
-        if status:
-            queryset = queryset.filter(status=status)
-        
-        return queryset.order_by('-created_at')
+        # Segment/status filters and ranked full-text search
+        return filter_customers(queryset, self.request.GET)
     
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
@@ -51,6 +44,8 @@ class CustomerListView(LoginRequiredMixin, ListView):
         context['search'] = self.request.GET.get('search', '')
         context['selected_segment'] = self.request.GET.get('segment', '')
         context['selected_status'] = self.request.GET.get('status', '')
+        context['sort_options'] = list(SORT_OPTIONS)
+        context['selected_sort'] = self.request.GET.get('sort', '')
         return context
 
 class CustomerDetailView(LoginRequiredMixin, DetailView):
@@ -58,20 +53,34 @@ class CustomerDetailView(LoginRequiredMixin, DetailView):
     template_name = 'customers/customer_detail.html'
     context_object_name = 'customer'
     
+    def get_queryset(self):
+        return Customer.objects.select_related('segment', 'created_by').prefetch_related(
+            Prefetch(
+                'interactions',
+                queryset=CustomerInteraction.objects.select_related('created_by').order_by('-created_at')[:10],
+                to_attr='recent_interaction_list',
+            ),
+            Prefetch(
+                'purchases',
+                queryset=Purchase.objects.order_by('-purchase_date')[:10],
+                to_attr='recent_purchase_list',
+            ),
+        )
+    
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
-        customer = self.get_object()
+        customer = self.object
         
         # Get recent interactions
-        context['recent_interactions'] = customer.interactions.all()[:10]
+        context['recent_interactions'] = customer.recent_interaction_list
         
         # Get purchase history
-        context['purchases'] = customer.purchases.all()[:10]
+        context['purchases'] = customer.recent_purchase_list
         
         # Calculate statistics
-        context['total_purchases'] = customer.purchases.count()
+        context['total_purchases'] = customer.purchase_count
         context['total_revenue'] = customer.total_revenue
-        context['last_interaction'] = customer.interactions.first()
+        context['last_interaction'] = next(iter(customer.recent_interaction_list), None)
         
         return context
 
@@ -147,244 +156,53 @@ def add_purchase(request, customer_id):
 
 @login_required
 def export_customers(request):
-    """Export customers to CSV"""
-    response = HttpResponse(content_type='text/csv')
+    """Export customers to CSV, streamed row by row with the list view filters applied"""
+    customers = filter_customers(Customer.objects.all(), request.GET)
+    response = StreamingHttpResponse(iter_csv_lines(customers), content_type='text/csv')
     response['Content-Disposition'] = 'attachment; filename="customers.csv"'
-    
-    writer = csv.writer(response)
-    writer.writerow([
-        'Nome', 'Email', 'Telefone', 'Empresa', 'Segmento', 
-        'Status', 'Receita Total', 'Data de Criação'
-    ])
-    
-    customers = Customer.objects.select_related('segment').all()
-    for customer in customers:
-        writer.writerow([
-            customer.full_name,
-            customer.email,
-            customer.phone,
-            customer.company,
-            customer.segment.name if customer.segment else '',
-            customer.get_status_display(),
-            customer.total_revenue,
-            customer.created_at.strftime('%d/%m/%Y')
-        ])
-    
     return response
 
 @login_required
-def customer_stats_api(request):
-    """API endpoint for customer statistics"""
-    stats = {
-        'total_customers': Customer.objects.count(),
-        'active_customers': Customer.objects.filter(status='active').count(),
-        'prospects': Customer.objects.filter(status='prospect').count(),
-        'total_revenue': Customer.objects.aggregate(
-            total=Sum('total_revenue')
-        )['total'] or 0,
-        'customers_by_segment': list(
-            CustomerSegment.objects.annotate(
-                count=Count('customer')
-            ).values('name', 'count', 'color')
-        ),
-        'recent_customers': Customer.objects.filter(
-            created_at__gte=timezone.now() - timedelta(days=30)
-        ).count(),
+def start_customer_export(request):
+    """Queue a background export using the list view filters"""
+    if request.method != 'POST':
+        return JsonResponse({'error': 'POST required'}, status=405)
+    
+    filters = {
+        key: request.POST.get(key) or request.GET.get(key, '')
+        for key in ('search', 'segment', 'status')
     }
+    export = CustomerExport.objects.create(filters=filters, created_by=request.user)
+    run_customer_export.delay(str(export.pk))
     
-    return JsonResponse(stats)
-from django.shortcuts import render, get_object_or_404, redirect
-from django.contrib.auth.decorators import login_required
-from django.contrib.auth.mixins import LoginRequiredMixin
-from django.contrib import messages
-from django.db.models import Q, Sum, Count
-from django.http import JsonResponse, HttpResponse
-from django.views.generic import ListView, DetailView, CreateView, UpdateView, DeleteView
-from django.urls import reverse_lazy
-from django.core.paginator import Paginator
-import csv
-from datetime import datetime, timedelta
-
-from .models import Customer, CustomerSegment, CustomerInteraction, Purchase
-from .forms import CustomerForm, CustomerInteractionForm, PurchaseForm
-
-class CustomerListView(LoginRequiredMixin, ListView):
-    model = Customer
-    template_name = 'customers/customer_list.html'
-    context_object_name = 'customers'
-    paginate_by = 20
-    
-    def get_queryset(self):
-        queryset = Customer.objects.select_related('segment', 'created_by')
-        
-        # Search functionality
-        search = self.request.GET.get('search')
-        if search:
-            queryset = queryset.filter(
-                Q(first_name__icontains=search) |
-                Q(last_name__icontains=search) |
-                Q(email__icontains=search) |
-                Q(company__icontains=search)
-            )
-        
-        # Filter by segment
-        segment = self.request.GET.get('segment')
-        if segment:
-            queryset = queryset.filter(segment_id=segment)
-        
-        # Filter by status
-        status = self.request.GET.get('status')
-        if status:
-            queryset = queryset.filter(status=status)
-        
-        return queryset.order_by('-created_at')
-    
-    def get_context_data(self, **kwargs):
-        context = super().get_context_data(**kwargs)
-        context['segments'] = CustomerSegment.objects.all()
-        context['status_choices'] = Customer.STATUS_CHOICES
-        context['search'] = self.request.GET.get('search', '')
-        context['selected_segment'] = self.request.GET.get('segment', '')
-        context['selected_status'] = self.request.GET.get('status', '')
-        return context
-
-class CustomerDetailView(LoginRequiredMixin, DetailView):
-    model = Customer
-    template_name = 'customers/customer_detail.html'
-    context_object_name = 'customer'
-    
-    def get_context_data(self, **kwargs):
-        context = super().get_context_data(**kwargs)
-        customer = self.get_object()
-        
-        # Get recent interactions
-        context['recent_interactions'] = customer.interactions.all()[:10]
-        
-        # Get purchase history
-        context['purchases'] = customer.purchases.all()[:10]
-        
-        # Calculate statistics
-        context['total_purchases'] = customer.purchases.count()
-        context['total_revenue'] = customer.total_revenue
-        context['last_interaction'] = customer.interactions.first()
-        
-        return context
-
-class CustomerCreateView(LoginRequiredMixin, CreateView):
-    model = Customer
-    form_class = CustomerForm
-    template_name = 'customers/customer_form.html'
-    success_url = reverse_lazy('customers:list')
-    
-    def form_valid(self, form):
-        form.instance.created_by = self.request.user
-        messages.success(self.request, 'Cliente criado com sucesso!')
-        return super().form_valid(form)
-
-class CustomerUpdateView(LoginRequiredMixin, UpdateView):
-    model = Customer
-    form_class = CustomerForm
-    template_name = 'customers/customer_form.html'
-    
-    def form_valid(self, form):
-        messages.success(self.request, 'Cliente atualizado com sucesso!')
-        return super().form_valid(form)
-
-class CustomerDeleteView(LoginRequiredMixin, DeleteView):
-    model = Customer
-    template_name = 'customers/customer_confirm_delete.html'
-    success_url = reverse_lazy('customers:list')
-    
-    def delete(self, request, *args, **kwargs):
-        messages.success(request, 'Cliente excluído com sucesso!')
-        return super().delete(request, *args, **kwargs)
-
-@login_required
-def add_interaction(request, customer_id):
-    customer = get_object_or_404(Customer, id=customer_id)
-    
-    if request.method == 'POST':
-        form = CustomerInteractionForm(request.POST)
-        if form.is_valid():
-            interaction = form.save(commit=False)
-            interaction.customer = customer
-            interaction.created_by = request.user
-            interaction.save()
-            messages.success(request, 'Interação adicionada com sucesso!')
-            return redirect('customers:detail', pk=customer_id)
-    else:
-        form = CustomerInteractionForm()
-    
-    return render(request, 'customers/add_interaction.html', {
-        'form': form,
-        'customer': customer
-    })
+    return JsonResponse({'id': str(export.pk), 'status': export.status}, status=202)
 
 @login_required
-def add_purchase(request, customer_id):
-    customer = get_object_or_404(Customer, id=customer_id)
-    
-    if request.method == 'POST':
-        form = PurchaseForm(request.POST)
-        if form.is_valid():
-            purchase = form.save(commit=False)
-            purchase.customer = customer
-            purchase.save()
-            messages.success(request, 'Compra adicionada com sucesso!')
-            return redirect('customers:detail', pk=customer_id)
-    else:
-        form = PurchaseForm()
-    
-    return render(request, 'customers/add_purchase.html', {
-        'form': form,
-        'customer': customer
+def customer_export_status(request, export_id):
+    """API endpoint for background export progress"""
+    export = get_object_or_404(CustomerExport, pk=export_id, created_by=request.user)
+    return JsonResponse({
+        'id': str(export.pk),
+        'status': export.status,
+        'progress': export.progress,
+        'processed_rows': export.processed_rows,
+        'total_rows': export.total_rows,
+        'error': export.error,
     })
 
 @login_required
-def export_customers(request):
-    """Export customers to CSV"""
-    response = HttpResponse(content_type='text/csv')
-    response['Content-Disposition'] = 'attachment; filename="customers.csv"'
-    
-    writer = csv.writer(response)
-    writer.writerow([
-        'Nome', 'Email', 'Telefone', 'Empresa', 'Segmento', 
-        'Status', 'Receita Total', 'Data de Criação'
-    ])
+def download_customer_export(request, export_id):
+    """Download a finished background export"""
+    export = get_object_or_404(
+        CustomerExport, pk=export_id, created_by=request.user, status='completed'
+    )
+    path = os.path.join(settings.MEDIA_ROOT, export.file_path)
+    if not os.path.exists(path):
+        raise Http404('Arquivo de exportação não encontrado.')
     
-    customers = Customer.objects.select_related('segment').all()
-    for customer in customers:
-        writer.writerow([
-            customer.full_name,
-            customer.email,
-            customer.phone,
-            customer.company,
-            customer.segment.name if customer.segment else '',
-            customer.get_status_display(),
-            customer.total_revenue,
-            customer.created_at.strftime('%d/%m/%Y')
-        ])
-    
-    return response
+    return FileResponse(open(path, 'rb'), as_attachment=True, filename='customers.csv')
 
 @login_required
 def customer_stats_api(request):
     """API endpoint for customer statistics"""
-    stats = {
-        'total_customers': Customer.objects.count(),
-        'active_customers': Customer.objects.filter(status='active').count(),
-        'prospects': Customer.objects.filter(status='prospect').count(),
-        'total_revenue': Customer.objects.aggregate(
-            total=Sum('total_revenue')
-        )['total'] or 0,
-        'customers_by_segment': list(
-            CustomerSegment.objects.annotate(
-                count=Count('customer')
-            ).values('name', 'count', 'color')
-        ),
-        'recent_customers': Customer.objects.filter(
-            created_at__gte=timezone.now() - timedelta(days=30)
-        ).count(),
-    }
-    
-    return JsonResponse(stats)
+    return JsonResponse(get_customer_stats())
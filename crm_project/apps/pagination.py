@@ -0,0 +1,132 @@
+import base64
+import json
+
+from django.db import connection
+from django.db.models import F, Q
+from django.http import Http404
+
+class KeysetPage:
+    """One page of keyset results with opaque cursors to its neighbours"""
+    
+    def __init__(self, object_list, next_cursor, previous_cursor, estimated_count=None):
+        self.object_list = object_list
+        self.next_cursor = next_cursor
+        self.previous_cursor = previous_cursor
+        self.estimated_count = estimated_count
+    
+    @property
+    def has_next(self):
+        return self.next_cursor is not None
+    
+    @property
+    def has_previous(self):
+        return self.previous_cursor is not None
+    
+    def has_other_pages(self):
+        return self.has_next or self.has_previous
+    
+    def __iter__(self):
+        return iter(self.object_list)
+    
+    def __len__(self):
+        return len(self.object_list)
+
+def encode_cursor(values, direction):
+    payload = json.dumps({'v': [str(value) for value in values], 'd': direction})
+    return base64.urlsafe_b64encode(payload.encode()).decode().rstrip('=')
+
+def decode_cursor(token, fields):
+    """Returns (values, direction), values converted back through the model fields"""
+    try:
+        payload = json.loads(base64.urlsafe_b64decode(token + '=' * (-len(token) % 4)))
+        values = [field.to_python(value) for field, value in zip(fields, payload['v'], strict=True)]
+        direction = payload['d']
+    except Exception:
+        raise Http404('Invalid cursor')
+    if direction not in ('next', 'prev'):
+        raise Http404('Invalid cursor')
+    return values, direction
+
+def keyset_filter(values, names, descending):
+    """Rows strictly after values in (names) order, e.g. (a, b) > (x, y)"""
+    (first, second), (first_value, second_value) = names, values
+    after, bound = ('lt', 'lte') if descending else ('gt', 'gte')
+    # The redundant bound on the leading column lets PostgreSQL scan the index as a range
+    return Q(**{f'{first}__{bound}': first_value}) & (
+        Q(**{f'{first}__{after}': first_value}) | Q(**{f'{second}__{after}': second_value})
+    )
+
+def keyset_ordering(names, descending):
+    return [F(name).desc() if descending else F(name).asc() for name in names]
+
+def estimated_row_count(model):
+    """Planner estimate of a table's rows from pg_class (None when unavailable)"""
+    if connection.vendor != 'postgresql':
+        return None
+    with connection.cursor() as cursor:
+        cursor.execute('SELECT reltuples::bigint FROM pg_class WHERE oid = %s::regclass', [model._meta.db_table])
+        row = cursor.fetchone()
+    if row is None or row[0] < 0:
+        # -1 means the table was never analyzed
+        return None
+    return row[0]
+
+def keyset_paginate(queryset, names, page_size, cursor=None, descending=False):
+    """Page through queryset ordered by two unique-together columns, without OFFSET or COUNT.
+    
+    Every page, however deep, is an index range scan of page_size + 1 rows.
+    """
+    fields = [queryset.model._meta.get_field(name) for name in names]
+    direction = 'next'
+    if cursor:
+        values, direction = decode_cursor(cursor, fields)
+    
+    backwards = direction == 'prev'
+    scan_descending = descending != backwards
+    page = queryset.order_by(*keyset_ordering(names, scan_descending))
+    if cursor:
+        page = page.filter(keyset_filter(values, names, scan_descending))
+    
+    rows = list(page[:page_size + 1])
+    has_more = len(rows) > page_size
+    rows = rows[:page_size]
+    if backwards:
+        rows.reverse()
+    
+    def key(row):
+        return [getattr(row, field.attname) for field in fields]
+    
+    next_cursor = previous_cursor = None
+    if rows:
+        if has_more or backwards:
+            next_cursor = encode_cursor(key(rows[-1]), 'next')
+        if cursor and (has_more or not backwards):
+            previous_cursor = encode_cursor(key(rows[0]), 'prev')
+    return KeysetPage(rows, next_cursor, previous_cursor)
+
+class KeysetPaginationMixin:
+    """ListView pagination by cursor (?cursor=) instead of page number.
+    
+    Views fall back to regular offset pagination when use_keyset() is False,
+    e.g. for orderings the keyset does not cover.
+    """
+    keyset_fields = None
+    keyset_descending = False
+    cursor_kwarg = 'cursor'
+    
+    def use_keyset(self):
+        return True
+    
+    def paginate_queryset(self, queryset, page_size):
+        if not self.use_keyset():
+            return super().paginate_queryset(queryset, page_size)
+        
+        page = keyset_paginate(
+            queryset, self.keyset_fields, page_size,
+            cursor=self.request.GET.get(self.cursor_kwarg),
+            descending=self.keyset_descending,
+        )
+        if not queryset.query.where:
+            # Only the unfiltered list matches the table-wide estimate
+            page.estimated_count = estimated_row_count(queryset.model)
+        return None, page, page.object_list, page.has_other_pages()
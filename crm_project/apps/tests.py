@@ -1,3 +1,389 @@
-from django.test import TestCase
+import email
+import json
+import threading
+from datetime import timedelta
+from decimal import Decimal
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from unittest import mock
+from urllib.parse import parse_qs, urlsplit
 
-# Create your tests here.
+from django.contrib.auth.models import User
+from django.core import mail
+from django.core.cache import cache
+from django.core.mail import EmailMessage
+from django.test import RequestFactory, TestCase, override_settings
+from django.utils import timezone
+from requests.adapters import HTTPAdapter
+
+from apps.appointments.calendar_providers import GoogleCalendarProvider, remote_change
+from apps.appointments.calendar_sync import apply_remote_changes, process_due_operations
+from apps.appointments import sms
+from apps.appointments.http import get_http_session
+from apps.appointments.reminders import send_due_reminders
+from apps.appointments.models import (
+    Appointment, AppointmentType, CalendarCredential, CalendarSyncOperation, SmsDelivery
+)
+from apps.appointments.services import google_client_cache
+from apps.customers.models import Customer, CustomerInteraction, Purchase
+from apps.customers.stats import get_customer_stats
+from apps.customers.views import CustomerDetailView
+
+class StubServer:
+    """Local HTTP server answering every request with handle(method, path, headers, body)"""
+    
+    def __init__(self, handle):
+        class Handler(BaseHTTPRequestHandler):
+            def do_request(self):
+                body = self.rfile.read(int(self.headers.get('Content-Length') or 0))
+                status, headers, content = handle(self.command, self.path, self.headers, body)
+                self.send_response(status)
+                for name, value in headers.items():
+                    self.send_header(name, value)
+                self.send_header('Content-Length', str(len(content)))
+                self.end_headers()
+                self.wfile.write(content)
+            
+            do_GET = do_POST = do_PUT = do_PATCH = do_DELETE = do_request
+            
+            def log_message(self, *args):
+                pass
+        
+        self.server = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+        self.url = f'http://127.0.0.1:{self.server.server_port}'
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+    
+    def route(self, session, test):
+        """Send the session's https:// requests here for the rest of the test"""
+        original = session.adapters['https://']
+        session.mount('https://', StubAdapter(self.url))
+        test.addCleanup(session.mount, 'https://', original)
+        test.addCleanup(self.server.shutdown)
+
+class StubAdapter(HTTPAdapter):
+    def __init__(self, url):
+        super().__init__()
+        self.url = url
+    
+    def send(self, request, **kwargs):
+        parts = urlsplit(request.url)
+        request.url = self.url + parts.path + (f'?{parts.query}' if parts.query else '')
+        return super().send(request, **kwargs)
+
+def create_appointment(customer, user, appointment_type, **kwargs):
+    start = kwargs.pop('start', timezone.now() + timedelta(days=2))
+    return Appointment.objects.create(
+        customer=customer, appointment_type=appointment_type, assigned_to=user,
+        start_datetime=start, end_datetime=start + timedelta(hours=1), title='Consulta', **kwargs
+    )
+
+class CustomerDetailViewTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user('agent', password='secret')
+        cls.customer = Customer.objects.create(
+            first_name='Maria', last_name='Souza', email='maria@example.com', created_by=cls.user
+        )
+        for index in range(15):
+            CustomerInteraction.objects.create(
+                customer=cls.customer, interaction_type='note', subject=f'Nota {index}',
+                description='', created_by=cls.user
+            )
+            Purchase.objects.create(
+                customer=cls.customer, product_service=f'Serviço {index}', amount=Decimal('10.00')
+            )
+    
+    def test_query_budget(self):
+        request = RequestFactory().get('/')
+        request.user = self.user
+        
+        # Customer (with segment and creator), recent interactions, recent purchases
+        with self.assertNumQueries(3):
+            response = CustomerDetailView.as_view()(request, pk=self.customer.pk)
+        
+        context = response.context_data
+        self.assertEqual(len(context['recent_interactions']), 10)
+        self.assertEqual(len(context['purchases']), 10)
+        self.assertEqual(context['total_purchases'], 15)
+        self.assertEqual(context['total_revenue'], Decimal('150.00'))
+        self.assertEqual(context['last_interaction'], context['recent_interactions'][0])
+
+class CustomerSaveTests(TestCase):
+    def test_full_save_keeps_concurrent_revenue(self):
+        customer = Customer.objects.create(first_name='Ana', last_name='Lima', email='ana@example.com')
+        stale = Customer.objects.get(pk=customer.pk)
+        
+        Purchase.objects.create(customer=customer, product_service='Serviço', amount=Decimal('25.00'))
+        stale.notes = 'Cliente preferencial'
+        stale.save()
+        
+        customer.refresh_from_db()
+        self.assertEqual(customer.notes, 'Cliente preferencial')
+        self.assertEqual(customer.total_revenue, Decimal('25.00'))
+        self.assertEqual(customer.purchase_count, 1)
+
+class CustomerStatsTests(TestCase):
+    def setUp(self):
+        cache.clear()
+    
+    def test_write_invalidates_cached_stats(self):
+        Customer.objects.create(first_name='Ana', last_name='Lima', email='ana@example.com')
+        self.assertEqual(get_customer_stats()['total_customers'], 1)
+        
+        Customer.objects.create(first_name='João', last_name='Reis', email='joao@example.com')
+        self.assertEqual(get_customer_stats()['total_customers'], 2)
+
+class NextAppointmentTests(TestCase):
+    def test_moving_an_appointment_refreshes_both_customers(self):
+        user = User.objects.create_user('agent', password='secret')
+        first = Customer.objects.create(first_name='Ana', last_name='Lima', email='ana@example.com')
+        second = Customer.objects.create(first_name='João', last_name='Reis', email='joao@example.com')
+        appointment_type = AppointmentType.objects.create(name='Consulta', duration=timedelta(hours=1))
+        start = timezone.now() + timedelta(days=2)
+        appointment = Appointment.objects.create(
+            customer=first, appointment_type=appointment_type, assigned_to=user,
+            start_datetime=start, end_datetime=start + timedelta(hours=1), title='Consulta'
+        )
+        first.refresh_from_db()
+        self.assertEqual(first.next_appointment_at, start)
+        
+        appointment = Appointment.objects.get(pk=appointment.pk)
+        appointment.customer = second
+        appointment.save()
+        
+        first.refresh_from_db()
+        second.refresh_from_db()
+        self.assertIsNone(first.next_appointment_at)
+        self.assertEqual(second.next_appointment_at, start)
+
+class RemoteChangesTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        user = User.objects.create_user('agent', password='secret')
+        customer = Customer.objects.create(first_name='Ana', last_name='Lima', email='ana@example.com')
+        appointment_type = AppointmentType.objects.create(name='Consulta', duration=timedelta(hours=1))
+        cls.start = timezone.now() + timedelta(days=2)
+        cls.appointment = Appointment.objects.create(
+            customer=customer, appointment_type=appointment_type, assigned_to=user,
+            start_datetime=cls.start, end_datetime=cls.start + timedelta(hours=1), title='Consulta',
+            google_calendar_event_id='event-1'
+        )
+    
+    def remote_move(self):
+        moved = self.start + timedelta(hours=3)
+        change = remote_change('event-1', start=moved, end=moved + timedelta(hours=1), title='Consulta')
+        return apply_remote_changes(GoogleCalendarProvider(), [change]), moved
+    
+    def test_remote_edit_is_applied(self):
+        changed, moved = self.remote_move()
+        self.assertEqual(changed, 1)
+        self.appointment.refresh_from_db()
+        self.assertEqual(self.appointment.start_datetime, moved)
+    
+    def test_queued_local_edit_wins(self):
+        CalendarSyncOperation.objects.create(appointment=self.appointment, operation='update')
+        changed, _ = self.remote_move()
+        self.assertEqual(changed, 0)
+        self.appointment.refresh_from_db()
+        self.assertEqual(self.appointment.start_datetime, self.start)
+
+class ReminderTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        user = User.objects.create_user('agent', password='secret')
+        customer = Customer.objects.create(
+            first_name='Ana', last_name='Lima', email='ana@example.com', phone='+5511999990000'
+        )
+        appointment_type = AppointmentType.objects.create(name='Consulta', duration=timedelta(hours=1))
+        start = timezone.now() + timedelta(hours=3)
+        self.appointment = Appointment.objects.create(
+            customer=customer, appointment_type=appointment_type, assigned_to=user,
+            start_datetime=start, end_datetime=start + timedelta(hours=1), title='Consulta'
+        )
+    
+    def test_sms_failure_does_not_resend_emails(self):
+        def build_emails(batch, kind, connection):
+            return [
+                EmailMessage('Lembrete', '', to=[appointment.customer.email], connection=connection)
+                for appointment in batch
+            ]
+        
+        service = 'apps.appointments.services.NotificationService'
+        with mock.patch(f'{service}.build_appointment_emails', side_effect=build_emails), \
+                mock.patch(f'{service}.send_sms_reminders', side_effect=RuntimeError('twilio down')), \
+                self.assertLogs('apps.appointments.reminders', 'ERROR'):
+            self.assertEqual(send_due_reminders(), 1)
+        self.assertEqual(len(mail.outbox), 1)
+        self.appointment.refresh_from_db()
+        self.assertTrue(self.appointment.reminder_sent)
+        
+        with mock.patch(f'{service}.build_appointment_emails', side_effect=build_emails):
+            self.assertEqual(send_due_reminders(), 0)
+        self.assertEqual(len(mail.outbox), 1)
+
+class GoogleCalendarStub:
+    """Google batch and token endpoints: 429s on request, 404 for the 'gone' event, refresh tokens revoked"""
+    
+    def __init__(self):
+        self.batches = []
+        self.throttled = 0
+        self.throttle = 0
+    
+    def __call__(self, method, path, headers, body):
+        if path == '/token':
+            return 400, {'Content-Type': 'application/json'}, b'{"error": "invalid_grant"}'
+        if self.throttle:
+            self.throttle -= 1
+            self.throttled += 1
+            return 429, {'Retry-After': '0'}, b''
+        
+        batch = email.message_from_bytes(f"Content-Type: {headers['Content-Type']}\r\n\r\n".encode() + body)
+        parts = []
+        for part in batch.get_payload():
+            request_line = part.get_payload().splitlines()[0]
+            method, url = request_line.split()[:2]
+            if '/events/gone' in url:
+                status, content = '404 Not Found', {'error': {'code': 404, 'message': 'Not Found'}}
+            elif method == 'POST':
+                status, content = '200 OK', {'id': f'event-{len(self.batches)}-{len(parts)}'}
+            else:
+                status, content = '200 OK', {'id': url.split('/events/')[1].split('?')[0]}
+            content_id = part['Content-ID'][1:-1]
+            parts.append(
+                f"--stub\r\nContent-Type: application/http\r\nContent-ID: <response-{content_id}>\r\n\r\n"
+                f"HTTP/1.1 {status}\r\nContent-Type: application/json\r\n\r\n{json.dumps(content)}\r\n"
+            )
+        self.batches.append(parts)
+        return 200, {'Content-Type': 'multipart/mixed; boundary=stub'}, (''.join(parts) + '--stub--').encode()
+
+@override_settings(
+    GOOGLE_CALENDAR_CLIENT_ID='client-id', GOOGLE_CALENDAR_CLIENT_SECRET='secret', MICROSOFT_GRAPH_CLIENT_ID=''
+)
+class GoogleCalendarSyncTests(TestCase):
+    """The calendar outbox against a local stub of the Google batch and token endpoints"""
+    
+    def setUp(self):
+        self.google = GoogleCalendarStub()
+        StubServer(self.google).route(get_http_session(), self)
+        
+        self.user = User.objects.create_user('agent', password='secret')
+        CalendarCredential.objects.create(
+            user=self.user, provider='google', access_token='token', refresh_token='refresh',
+            expiry=timezone.now() + timedelta(hours=1)
+        )
+        self.customer = Customer.objects.create(first_name='Ana', last_name='Lima', email='ana@example.com')
+        self.appointment_type = AppointmentType.objects.create(name='Consulta', duration=timedelta(hours=1))
+        self.addCleanup(google_client_cache.evict, self.user.pk)
+    
+    def queue(self, operation='create', user=None, **kwargs):
+        appointment = create_appointment(self.customer, user or self.user, self.appointment_type, **kwargs)
+        return CalendarSyncOperation.objects.create(appointment=appointment, operation=operation)
+    
+    def test_operations_are_sent_in_batches(self):
+        operations = [self.queue() for _ in range(60)]
+        
+        self.assertEqual(process_due_operations(), 60)
+        
+        self.assertEqual([len(parts) for parts in self.google.batches], [50, 10])
+        for operation in operations:
+            operation.refresh_from_db()
+            self.assertEqual(operation.status, 'done')
+            self.assertTrue(operation.appointment.google_calendar_event_id.startswith('event-'))
+    
+    def test_throttled_batch_is_retried(self):
+        operation = self.queue()
+        self.google.throttle = 1
+        
+        process_due_operations()
+        
+        self.assertEqual(self.google.throttled, 1)
+        self.assertEqual(len(self.google.batches), 1)
+        operation.refresh_from_db()
+        self.assertEqual(operation.status, 'done')
+    
+    def test_failed_item_is_retried_later(self):
+        failing = self.queue('update', google_calendar_event_id='gone')
+        succeeding = self.queue('update', google_calendar_event_id='kept')
+        
+        process_due_operations()
+        
+        failing.refresh_from_db()
+        self.assertEqual((failing.status, failing.attempts), ('pending', 1))
+        self.assertIn('404', failing.last_error)
+        self.assertGreater(failing.next_attempt_at, timezone.now())
+        succeeding.refresh_from_db()
+        self.assertEqual(succeeding.status, 'done')
+    
+    def test_revoked_credentials_fail_only_their_operations(self):
+        revoked = User.objects.create_user('revoked', password='secret')
+        CalendarCredential.objects.create(user=revoked, provider='google', refresh_token='revoked')
+        self.addCleanup(google_client_cache.evict, revoked.pk)
+        failing = self.queue(user=revoked)
+        succeeding = self.queue()
+        
+        self.assertEqual(process_due_operations(), 2)
+        
+        failing.refresh_from_db()
+        self.assertEqual((failing.status, failing.attempts), ('pending', 1))
+        self.assertIn('invalid_grant', failing.last_error)
+        succeeding.refresh_from_db()
+        self.assertEqual(succeeding.status, 'done')
+
+class TwilioStub:
+    """Twilio Messages endpoint rejecting INVALID_NUMBER like Twilio does"""
+    INVALID_NUMBER = '+15005550001'
+    
+    def __init__(self):
+        self.sent = []
+    
+    def __call__(self, method, path, headers, body):
+        to = parse_qs(body.decode())['To'][0]
+        self.sent.append(to)
+        if to == self.INVALID_NUMBER:
+            content = {'code': 21211, 'message': "The 'To' number is not a valid phone number.", 'status': 400}
+            return 400, {'Content-Type': 'application/json'}, json.dumps(content).encode()
+        content = {'sid': f'SM{len(self.sent):032d}', 'to': to, 'status': 'queued'}
+        return 201, {'Content-Type': 'application/json'}, json.dumps(content).encode()
+
+@override_settings(TWILIO_ACCOUNT_SID='AC123', TWILIO_AUTH_TOKEN='token', TWILIO_PHONE_NUMBER='+15005550006')
+class SmsDeliveryTests(TestCase):
+    """send_sms_batch against a local stub of the Twilio API"""
+    
+    def setUp(self):
+        cache.clear()
+        sms._client = None
+        self.addCleanup(setattr, sms, '_client', None)
+        self.twilio = TwilioStub()
+        StubServer(self.twilio).route(sms.get_twilio_client().http_client.session, self)
+        
+        user = User.objects.create_user('agent', password='secret')
+        appointment_type = AppointmentType.objects.create(name='Consulta', duration=timedelta(hours=1))
+        self.appointments = {}
+        for name, phone in [('ana', '+5511999990000'), ('joao', TwilioStub.INVALID_NUMBER)]:
+            customer = Customer.objects.create(
+                first_name=name, last_name='Lima', email=f'{name}@example.com', phone=phone
+            )
+            self.appointments[name] = create_appointment(customer, user, appointment_type)
+    
+    def test_deliveries_record_each_result(self):
+        ana, joao = self.appointments['ana'], self.appointments['joao']
+        
+        deliveries = sms.send_sms_batch([(ana, 'Lembrete'), (joao, 'Lembrete')])
+        
+        self.assertEqual(len(deliveries), 2)
+        self.assertEqual(sorted(self.twilio.sent), sorted(['+5511999990000', TwilioStub.INVALID_NUMBER]))
+        sent = SmsDelivery.objects.get(appointment=ana)
+        self.assertEqual((sent.status, sent.to_number, sent.error), ('sent', '+5511999990000', ''))
+        self.assertTrue(sent.twilio_sid.startswith('SM'))
+        failed = SmsDelivery.objects.get(appointment=joao)
+        self.assertEqual((failed.status, failed.twilio_sid), ('failed', ''))
+        self.assertIn('not a valid phone number', failed.error)
+    
+    def test_repeated_number_is_rate_limited(self):
+        ana = self.appointments['ana']
+        
+        sms.send_sms_batch([(ana, 'Lembrete')])
+        sms.send_sms_batch([(ana, 'Lembrete')])
+        
+        self.assertEqual(self.twilio.sent, ['+5511999990000'])
+        statuses = SmsDelivery.objects.filter(appointment=ana).order_by('pk').values_list('status', flat=True)
+        self.assertEqual(list(statuses), ['sent', 'rate_limited'])
@@ -0,0 +1,11 @@
+import os
+
+from celery import Celery
+
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'crm_project.settings')
+
+app = Celery('crm_project')
+
+# Read the CELERY_* options from settings.py
+app.config_from_object('django.conf:settings', namespace='CELERY')
+app.autodiscover_tasks()
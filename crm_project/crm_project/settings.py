@@ -16,6 +16,7 @@ DJANGO_APPS = [
     'django.contrib.sessions',
     'django.contrib.messages',
     'django.contrib.staticfiles',
+    'django.contrib.postgres',
 ]
 
 LOCAL_APPS = [
@@ -54,7 +55,6 @@ TEMPLATES = [
     {
         'BACKEND': 'django.template.backends.django.DjangoTemplates',
         'DIRS': [BASE_DIR / 'templates'],
-        'APP_DIRS': True,
         'OPTIONS': {
             'context_processors': [
                 'django.template.context_processors.debug',
@@ -62,6 +62,13 @@ TEMPLATES = [
                 'django.contrib.auth.context_processors.auth',
                 'django.contrib.messages.context_processors.messages',
             ],
+            # Compiled templates are kept in memory instead of re-read from disk
+            'loaders': [
+                ('django.template.loaders.cached.Loader', [
+                    'django.template.loaders.filesystem.Loader',
+                    'django.template.loaders.app_directories.Loader',
+                ]),
+            ],
         },
     },
 ]
@@ -100,6 +107,33 @@ CELERY_ACCEPT_CONTENT = ['json']
 CELERY_TASK_SERIALIZER = 'json'
 CELERY_RESULT_SERIALIZER = 'json'
 CELERY_TIMEZONE = 'America/Sao_Paulo'
+CELERY_BEAT_SCHEDULER = 'django_celery_beat.schedulers:DatabaseScheduler'
+CELERY_BEAT_SCHEDULE = {
+    # Picks up calendar sync retries whose backoff has expired
+    'process-calendar-outbox': {
+        'task': 'apps.appointments.tasks.process_calendar_outbox',
+        'schedule': 60.0,
+    },
+    # Picks up appointment email retries whose backoff has expired
+    'send-email-outbox': {
+        'task': 'apps.appointments.tasks.send_email_outbox',
+        'schedule': 60.0,
+    },
+    'send-appointment-reminders': {
+        'task': 'apps.appointments.tasks.send_appointment_reminders',
+        'schedule': 15 * 60.0,
+    },
+    # Incremental pull of edits made directly in Google/Outlook
+    'pull-calendar-changes': {
+        'task': 'apps.appointments.tasks.pull_calendar_changes',
+        'schedule': 300.0,
+    },
+    # next_appointment_at goes stale as time passes, not only on writes
+    'refresh-next-appointments': {
+        'task': 'apps.customers.tasks.refresh_next_appointments',
+        'schedule': 300.0,
+    },
+}
 
 # Internationalization
 LANGUAGE_CODE = 'pt-br'